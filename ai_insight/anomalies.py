@@ -0,0 +1,127 @@
+import logging
+import math
+
+from django.db import transaction as db_transaction
+from django.db.models import Q
+
+from .models import AnomalyAlert, AnomalyStat
+
+
+logger = logging.getLogger(__name__)
+
+ALPHA = 0.1
+WARMUP = 10
+Z_THRESHOLD = 4.0
+# Floor for the standard deviation (log scale), so a series that has always
+# been the same value does not alert on the first small change.
+MIN_STD = 0.25
+
+
+def _observe(stat, value):
+    """
+    Score ``value`` against the stat's EWMA mean/variance (log scale, so an
+    extra zero is the same jump at any size), then fold it in. Outliers are
+    clipped before updating so one mistake does not drag the baseline.
+    Returns the z-score, or None while the stat is still warming up.
+    """
+    x = math.log1p(max(float(value), 0))
+    std = max(math.sqrt(stat.variance), MIN_STD)
+    score = (x - stat.mean) / std if stat.count >= WARMUP else None
+
+    if stat.count == 0:
+        stat.mean = x
+    else:
+        x = min(max(x, stat.mean - Z_THRESHOLD * std), stat.mean + Z_THRESHOLD * std)
+        diff = x - stat.mean
+        increment = ALPHA * diff
+        stat.mean += increment
+        stat.variance = (1 - ALPHA) * (stat.variance + diff * increment)
+    stat.count += 1
+    return score
+
+
+@db_transaction.atomic
+def _detect(events):
+    """
+    Run ``(kind, key, value, label, refs)`` events through their running
+    stats in order. Missing stats are inserted with conflicts ignored, so
+    concurrent first sightings cannot fail, then all of them are read back
+    locked and written with the alerts in bulk.
+    """
+    if not events:
+        return []
+
+    keys = {}
+    for kind, key, *_ in events:
+        keys.setdefault(kind, set()).add(key)
+    lookup = Q()
+    for kind, kind_keys in keys.items():
+        lookup |= Q(kind=kind, key__in=kind_keys)
+
+    AnomalyStat.objects.bulk_create(
+        [AnomalyStat(kind=kind, key=key) for kind, kind_keys in keys.items() for key in kind_keys],
+        ignore_conflicts=True,
+        batch_size=500
+    )
+    stats = {
+        (s.kind, s.key): s
+        for s in AnomalyStat.objects.select_for_update().filter(lookup).order_by('id')
+    }
+    alerts = []
+
+    for kind, key, value, label, refs in events:
+        stat = stats[(kind, key)]
+        expected = math.expm1(stat.mean)
+        score = _observe(stat, value)
+        if score is not None and abs(score) >= Z_THRESHOLD:
+            alerts.append(AnomalyAlert(
+                kind=kind,
+                key=key,
+                label=label,
+                nilai=value,
+                perkiraan=round(expected, 2),
+                skor=round(score, 2),
+                **refs
+            ))
+
+    AnomalyStat.objects.bulk_update(stats.values(), ['mean', 'variance', 'count'], batch_size=500)
+    return AnomalyAlert.objects.bulk_create(alerts)
+
+
+def _detect_on_commit(events):
+    """
+    Score ``events`` once the current transaction commits, outside the write
+    it observes. Detection is best effort: a failure is logged and never
+    reaches the sale or expense that triggered it.
+    """
+    def run():
+        try:
+            _detect(events)
+        except Exception:
+            logger.exception('Anomaly detection failed for %d events', len(events))
+
+    db_transaction.on_commit(run)
+
+
+def observe_sales(transactions, items):
+    """
+    Score freshly written sales after commit: each transaction total per
+    kasir and each line qty per product.
+    """
+    lines = {}
+    for item in items:
+        if item.product_id:
+            lines.setdefault(item.transaction_id, []).append(item)
+
+    events = []
+    for trx in transactions:
+        events.append(('transaksi', trx.user_id, trx.total, trx.user.username, {'transaction': trx}))
+        for item in lines.get(trx.pk, []):
+            events.append(('item', item.product_id, item.qty, item.product_name, {'transaction': trx}))
+    _detect_on_commit(events)
+
+
+def observe_expense(expense):
+    _detect_on_commit([
+        ('pengeluaran', expense.user_id, expense.jumlah, expense.user.username, {'expense': expense})
+    ])
@@ -0,0 +1,132 @@
+import math
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Max, Q
+
+from produks.models import KantinProduct
+from transactions.models import Transaction, TransactionItem
+from .models import BasketMiningState, BasketPairCount, BasketProductCount
+
+
+MAX_CANDIDATES = 500
+
+
+def _add(model, existing, increments, make):
+    """Add ``increments`` (``{key: n}``) onto ``existing`` rows or create them with ``make(key, n)``."""
+    changed, created = [], []
+    for key, n in increments.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(make(key, n))
+        else:
+            row.jumlah_transaksi += n
+            changed.append(row)
+
+    model.objects.bulk_update(changed, ['jumlah_transaksi'], batch_size=500)
+    model.objects.bulk_create(created, batch_size=500)
+
+
+@db_transaction.atomic
+def mine(reset=False):
+    """
+    Fold transactions recorded since the last run into the basket counts:
+    per product, the number of transactions containing it, and per product
+    pair, the number containing both. Both come from grouped queries (the
+    pairs from a self-join on the transaction), so no basket is walked in
+    Python. Returns the number of transactions added.
+    """
+    state, _ = BasketMiningState.objects.select_for_update().get_or_create(pk=1)
+    if reset:
+        BasketPairCount.objects.all().delete()
+        BasketProductCount.objects.all().delete()
+        state.last_transaction_id = 0
+        state.total_transaksi = 0
+
+    upto = Transaction.objects.aggregate(last=Max('id'))['last'] or 0
+    if upto <= state.last_transaction_id:
+        state.save()
+        return 0
+
+    baru = {'transaction_id__gt': state.last_transaction_id, 'transaction_id__lte': upto}
+    items = TransactionItem.objects.filter(product__isnull=False, **baru)
+
+    products = dict(
+        items
+        .values_list('product_id')
+        .annotate(n=Count('transaction_id', distinct=True))
+        .order_by()
+    )
+    pairs = {
+        (a, b): n
+        for a, b, n in items
+        .filter(transaction__items__product_id__gt=F('product_id'))
+        .values_list('product_id', 'transaction__items__product_id')
+        .annotate(n=Count('transaction_id', distinct=True))
+        .order_by()
+    }
+
+    _add(
+        BasketProductCount,
+        {row.product_id: row for row in BasketProductCount.objects.filter(product_id__in=products)},
+        products,
+        lambda pk, n: BasketProductCount(product_id=pk, jumlah_transaksi=n)
+    )
+    _add(
+        BasketPairCount,
+        {
+            (row.product_a_id, row.product_b_id): row
+            for row in BasketPairCount.objects.filter(product_a_id__in={a for a, _ in pairs})
+        },
+        pairs,
+        lambda key, n: BasketPairCount(product_a_id=key[0], product_b_id=key[1], jumlah_transaksi=n)
+    )
+
+    added = Transaction.objects.filter(id__gt=state.last_transaction_id, id__lte=upto).count()
+    state.last_transaction_id = upto
+    state.total_transaksi += added
+    state.save()
+    return added
+
+
+def rules(product_id=None, limit=10, min_support=0.0):
+    """
+    "Bought together" rules ``antecedent -> consequent`` with support,
+    confidence and lift, from the stored counts. With ``product_id`` only
+    rules starting from that product; otherwise the most frequent pairs,
+    both directions. Sorted by lift, then confidence.
+    """
+    state = BasketMiningState.objects.filter(pk=1).first()
+    total = state.total_transaksi if state else 0
+    if not total:
+        return state, []
+
+    pairs = BasketPairCount.objects.filter(jumlah_transaksi__gte=max(1, math.ceil(min_support * total)))
+    if product_id:
+        pairs = pairs.filter(Q(product_a_id=product_id) | Q(product_b_id=product_id))
+    else:
+        pairs = pairs.order_by('-jumlah_transaksi')[:MAX_CANDIDATES]
+    pairs = list(pairs.values_list('product_a_id', 'product_b_id', 'jumlah_transaksi'))
+
+    ids = {pk for a, b, _ in pairs for pk in (a, b)}
+    counts = dict(BasketProductCount.objects.filter(product_id__in=ids).values_list('product_id', 'jumlah_transaksi'))
+    names = dict(KantinProduct.objects.filter(id__in=ids).values_list('id', 'product_gudang__name'))
+
+    hasil = []
+    for a, b, n in pairs:
+        for antecedent, consequent in ((a, b), (b, a)):
+            if product_id and antecedent != product_id:
+                continue
+            confidence = n / counts[antecedent]
+            hasil.append({
+                'produk_id': antecedent,
+                'produk': names.get(antecedent),
+                'dibeli_bersama_id': consequent,
+                'dibeli_bersama': names.get(consequent),
+                'jumlah_transaksi': n,
+                'support': round(n / total, 4),
+                'confidence': round(confidence, 4),
+                'lift': round(confidence * total / counts[consequent], 4),
+            })
+
+    hasil.sort(key=lambda r: (r['lift'], r['confidence']), reverse=True)
+    return state, hasil[:limit]
@@ -0,0 +1,224 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from produks.models import KantinProduct
+from reports.models import DailyProductSales
+from .models import ForecastSnapshot, ProductForecast
+
+
+LOOKBACK_DAYS = 56
+HORIZON_DAYS = 30
+MOVING_AVERAGE_DAYS = 7
+ALPHA = 0.3
+LEAD_TIME_DAYS = 2
+REVIEW_DAYS = 7
+SERVICE_Z = 1.65
+SEGERA_HABIS_HARI = 3
+# Below this many units a day a product is treated as not selling, and a
+# stockout further out than MAX_HABIS_HARI days is not a real prediction.
+MIN_DAILY_RATE = 0.01
+MAX_HABIS_HARI = 4 * HORIZON_DAYS
+
+
+def sales_matrix(product_ids, start, days):
+    """
+    Units sold as a ``(len(product_ids), days)`` array, column 0 being
+    ``start``, read from the daily product rollup in one query.
+    """
+    index = {pk: row for row, pk in enumerate(product_ids)}
+    matrix = np.zeros((len(product_ids), days))
+
+    rows = list(
+        DailyProductSales.objects
+        .filter(
+            product__isnull=False,
+            tanggal__gte=start,
+            tanggal__lt=start + timedelta(days=days)
+        )
+        .values_list('product_id', 'tanggal', 'qty')
+    )
+    if rows:
+        pks, tanggal, qty = zip(*rows)
+        product_rows = np.array([index.get(pk, -1) for pk in pks])
+        columns = np.array([(day - start).days for day in tanggal])
+        known = product_rows >= 0
+        np.add.at(matrix, (product_rows[known], columns[known]), np.array(qty, dtype=float)[known])
+
+    return matrix
+
+
+def weekday_index(matrix, weekdays):
+    """
+    Per-product weekday seasonality (``(products, 7)``, 1.0 = average day),
+    shrunk towards 1 for products with few weeks of history.
+    """
+    onehot = np.eye(7)[weekdays]
+    per_weekday = (matrix @ onehot) / np.maximum(onehot.sum(axis=0), 1)
+    overall = matrix.mean(axis=1, keepdims=True)
+
+    raw = np.divide(per_weekday, overall, out=np.ones_like(per_weekday), where=overall > 0)
+    weeks = matrix.shape[1] / 7
+    return 1 + (raw - 1) * weeks / (weeks + 2)
+
+
+def smoothed_level(series):
+    """Simple exponential smoothing level of every row, as one weighted sum."""
+    days = series.shape[1]
+    weights = ALPHA * (1 - ALPHA) ** np.arange(days - 1, -1, -1)
+    weights[0] = (1 - ALPHA) ** (days - 1)
+    return series @ weights
+
+
+def days_until_empty(daily, stock):
+    """
+    Fractional days until cumulative forecast demand uses up ``stock``;
+    extrapolated past the horizon at the average forecast rate. ``inf`` when
+    the rate is below ``MIN_DAILY_RATE`` or the stock lasts beyond
+    ``MAX_HABIS_HARI``, i.e. nothing is really expected to sell.
+    """
+    cumulative = daily.cumsum(axis=1)
+    reached = cumulative >= stock[:, None]
+    within = reached.any(axis=1)
+
+    first = reached.argmax(axis=1)
+    rows = np.arange(len(stock))
+    before = cumulative[rows, first] - daily[rows, first]
+    partial = np.divide(stock - before, daily[rows, first], out=np.zeros_like(stock), where=daily[rows, first] > 0)
+
+    rate = daily.mean(axis=1)
+    beyond = daily.shape[1] + np.divide(
+        stock - cumulative[:, -1], rate, out=np.full_like(stock, np.inf), where=rate >= MIN_DAILY_RATE
+    )
+    days = np.where(within, first + partial, beyond)
+    return np.where(days > MAX_HABIS_HARI, np.inf, days)
+
+
+def reorder_quantity(daily, safety, stock):
+    """Units to add so stock covers lead time plus one review period, with ``safety`` on top."""
+    needed = daily[:, :LEAD_TIME_DAYS + REVIEW_DAYS].sum(axis=1) + safety
+    return np.ceil(np.maximum(needed - stock, 0)).astype(int)
+
+
+def forecast(matrix, start, stock, horizon=HORIZON_DAYS):
+    """
+    Forecast every product at once from its sales ``matrix`` (starting on
+    ``start``) and current ``stock``: weekday-adjusted exponential smoothing,
+    stockout timing and the reorder quantity covering lead time plus one
+    review period with a safety stock.
+    """
+    days = matrix.shape[1]
+    weekdays = (start.weekday() + np.arange(days)) % 7
+    future_weekdays = (start.weekday() + days + np.arange(horizon)) % 7
+
+    season = weekday_index(matrix, weekdays)
+    deseasonalised = matrix / np.maximum(season[:, weekdays], 0.1)
+    level = smoothed_level(deseasonalised)
+    daily = level[:, None] * season[:, future_weekdays]
+
+    sigma = deseasonalised[:, -28:].std(axis=1)
+    safety = SERVICE_Z * sigma * np.sqrt(LEAD_TIME_DAYS + REVIEW_DAYS)
+
+    return {
+        'moving_average': matrix[:, -MOVING_AVERAGE_DAYS:].mean(axis=1),
+        'level': level,
+        'season': season,
+        'daily': daily,
+        'safety': safety,
+        'days_until_empty': days_until_empty(daily, stock),
+        'reorder': reorder_quantity(daily, safety, stock),
+    }
+
+
+def forecast_products(lookback=LOOKBACK_DAYS, horizon=HORIZON_DAYS):
+    """
+    Forecast every kantin product from the last ``lookback`` full days of
+    sales: two queries (products, sales rollup) and one vectorised pass.
+    Returns ``(products, result)`` with the rows of ``result`` in the order
+    of ``products``.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=lookback)
+
+    products = list(KantinProduct.objects.select_related('product_gudang').order_by('id'))
+    matrix = sales_matrix([kp.id for kp in products], start, lookback)
+    stock = np.array([kp.stock_kantin for kp in products], dtype=float)
+
+    return products, forecast(matrix, start, stock, horizon)
+
+
+@db_transaction.atomic
+def take_snapshot(lookback=LOOKBACK_DAYS, horizon=HORIZON_DAYS):
+    """Run the forecast for every product and store it as the newest snapshot."""
+    products, hasil = forecast_products(lookback, horizon)
+
+    snapshot = ForecastSnapshot.objects.create(
+        tanggal=timezone.localdate(),
+        lookback_days=lookback,
+        horizon_days=horizon
+    )
+    ProductForecast.objects.bulk_create(
+        [
+            ProductForecast(
+                snapshot=snapshot,
+                product=kp,
+                stock_at_snapshot=kp.stock_kantin,
+                daily_rate=float(hasil['level'][i]),
+                moving_average=float(hasil['moving_average'][i]),
+                safety_stock=float(hasil['safety'][i]),
+                daily_forecast=[round(float(x), 3) for x in hasil['daily'][i]]
+            )
+            for i, kp in enumerate(products)
+        ],
+        batch_size=500
+    )
+    return snapshot
+
+
+def latest_forecast():
+    """
+    ``(products, result, snapshot)`` like ``forecast_products`` but read from
+    the newest snapshot, re-evaluated against current stock: the stored
+    daily curve is shifted to start today, then stockout and reorder are
+    recomputed. Products added since the snapshot have no forecast yet.
+    Computes live (``snapshot`` is None) when there is no snapshot or it no
+    longer covers the reorder window.
+    """
+    today = timezone.localdate()
+    snapshot = ForecastSnapshot.objects.order_by('-created_at').first()
+    if snapshot is None:
+        return (*forecast_products(), None)
+
+    shift = (today - snapshot.tanggal).days
+    horizon = snapshot.horizon_days - shift
+    if horizon < LEAD_TIME_DAYS + REVIEW_DAYS:
+        return (*forecast_products(), None)
+
+    products = list(KantinProduct.objects.select_related('product_gudang').order_by('id'))
+    stored = {
+        row[0]: row[1:]
+        for row in snapshot.forecasts.values_list(
+            'product_id', 'daily_rate', 'moving_average', 'safety_stock', 'daily_forecast'
+        )
+    }
+
+    level = np.zeros(len(products))
+    moving_average = np.zeros(len(products))
+    safety = np.zeros(len(products))
+    daily = np.zeros((len(products), horizon))
+    for i, kp in enumerate(products):
+        if kp.id in stored:
+            level[i], moving_average[i], safety[i], curve = stored[kp.id]
+            daily[i] = curve[shift:]
+
+    stock = np.array([kp.stock_kantin for kp in products], dtype=float)
+    return products, {
+        'moving_average': moving_average,
+        'level': level,
+        'daily': daily,
+        'safety': safety,
+        'days_until_empty': days_until_empty(daily, stock),
+        'reorder': reorder_quantity(daily, safety, stock),
+    }, snapshot
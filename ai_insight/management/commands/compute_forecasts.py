@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ai_insight.forecasting import HORIZON_DAYS, LOOKBACK_DAYS, take_snapshot
+from ai_insight.models import ForecastSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute demand forecasts and stockout estimates for every kantin product '
+        'and store them as a new snapshot. Schedule nightly, e.g. '
+        '"15 0 * * * python manage.py compute_forecasts".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookback', type=int, default=LOOKBACK_DAYS, help='Days of sales history to use.')
+        parser.add_argument('--horizon', type=int, default=HORIZON_DAYS, help='Days to forecast ahead.')
+        parser.add_argument('--keep', type=int, default=7, help='Number of snapshots to keep.')
+
+    def handle(self, *args, **options):
+        snapshot = take_snapshot(options['lookback'], options['horizon'])
+
+        old = ForecastSnapshot.objects.order_by('-created_at').values_list('id', flat=True)[options['keep']:]
+        deleted, _ = ForecastSnapshot.objects.filter(id__in=list(old)).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {snapshot.pk}: {snapshot.forecasts.count()} product forecast(s) stored, '
+            f'{deleted} old row(s) removed'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ai_insight.baskets import mine
+
+
+class Command(BaseCommand):
+    help = (
+        'Update the "frequently bought together" counts with transactions '
+        'recorded since the last run. Safe to schedule frequently.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Drop the counts and mine every transaction again.')
+
+    def handle(self, *args, **options):
+        added = mine(reset=options['reset'])
+        self.stdout.write(self.style.SUCCESS(f'{added} transaction(s) mined'))
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 13:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('produks', '0005_delete_product_kantinproduct_product_gudang'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('lookback_days', models.PositiveSmallIntegerField()),
+                ('horizon_days', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_at_snapshot', models.PositiveIntegerField()),
+                ('daily_rate', models.FloatField()),
+                ('moving_average', models.FloatField()),
+                ('safety_stock', models.FloatField()),
+                ('daily_forecast', models.JSONField(default=list)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='produks.kantinproduct')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='ai_insight.forecastsnapshot')),
+            ],
+            options={
+                'unique_together': {('snapshot', 'product')},
+            },
+        ),
+    ]
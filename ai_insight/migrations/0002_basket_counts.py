@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 13:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produks', '0005_delete_product_kantinproduct_product_gudang'),
+        ('ai_insight', '0001_forecast_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BasketMiningState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.PositiveBigIntegerField(default=0)),
+                ('total_transaksi', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BasketProductCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jumlah_transaksi', models.PositiveIntegerField(default=0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='basket_count', to='produks.kantinproduct')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BasketPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jumlah_transaksi', models.PositiveIntegerField(default=0)),
+                ('product_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produks.kantinproduct')),
+                ('product_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produks.kantinproduct')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='basketpaircount',
+            index=models.Index(fields=['jumlah_transaksi'], name='basket_pair_jumlah_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='basketpaircount',
+            unique_together={('product_a', 'product_b')},
+        ),
+    ]
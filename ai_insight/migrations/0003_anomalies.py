@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-18 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0002_report_indexes'),
+        ('transactions', '0010_report_indexes'),
+        ('ai_insight', '0002_basket_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('transaksi', 'Total transaksi per kasir'), ('item', 'Qty per produk'), ('pengeluaran', 'Pengeluaran per kasir')], max_length=20)),
+                ('key', models.PositiveBigIntegerField()),
+                ('mean', models.FloatField(default=0)),
+                ('variance', models.FloatField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AnomalyAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('transaksi', 'Total transaksi per kasir'), ('item', 'Qty per produk'), ('pengeluaran', 'Pengeluaran per kasir')], max_length=20)),
+                ('key', models.PositiveBigIntegerField()),
+                ('label', models.CharField(max_length=255)),
+                ('nilai', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('perkiraan', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('skor', models.FloatField()),
+                ('ditinjau', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ditinjau_oleh', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('expense', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='expenses.expense')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='transactions.transaction')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='anomalyalert',
+            index=models.Index(fields=['ditinjau', 'created_at'], name='anomaly_alert_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anomalyalert',
+            index=models.Index(fields=['created_at'], name='anomaly_alert_created_idx'),
+        ),
+    ]
@@ -1,3 +1,173 @@
 from django.db import models
+from django.conf import settings
+from produks.models import KantinProduct
 
-# Create your models here.
+
+class ForecastSnapshot(models.Model):
+    tanggal = models.DateField()
+
+    lookback_days = models.PositiveSmallIntegerField()
+
+    horizon_days = models.PositiveSmallIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Forecast {self.tanggal} ({self.created_at})"
+
+
+class ProductForecast(models.Model):
+    snapshot = models.ForeignKey(
+        ForecastSnapshot,
+        on_delete=models.CASCADE,
+        related_name='forecasts'
+    )
+
+    product = models.ForeignKey(
+        KantinProduct,
+        on_delete=models.CASCADE
+    )
+
+    stock_at_snapshot = models.PositiveIntegerField()
+
+    daily_rate = models.FloatField()
+
+    moving_average = models.FloatField()
+
+    safety_stock = models.FloatField()
+
+    # Forecast units per day, starting on the snapshot's tanggal.
+    daily_forecast = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('snapshot', 'product')
+
+    def __str__(self):
+        return f"{self.product} @ {self.snapshot.tanggal}: {self.daily_rate:.2f}/hari"
+
+
+class BasketMiningState(models.Model):
+    last_transaction_id = models.PositiveBigIntegerField(default=0)
+
+    total_transaksi = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Basket mining up to transaksi {self.last_transaction_id}"
+
+
+class BasketProductCount(models.Model):
+    product = models.OneToOneField(
+        KantinProduct,
+        on_delete=models.CASCADE,
+        related_name='basket_count'
+    )
+
+    jumlah_transaksi = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product}: {self.jumlah_transaksi}"
+
+
+class BasketPairCount(models.Model):
+    # product_a_id < product_b_id, so each pair is stored once.
+    product_a = models.ForeignKey(
+        KantinProduct,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    product_b = models.ForeignKey(
+        KantinProduct,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    jumlah_transaksi = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product_a', 'product_b')
+        indexes = [
+            models.Index(fields=['jumlah_transaksi'], name='basket_pair_jumlah_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_a_id} + {self.product_b_id}: {self.jumlah_transaksi}"
+
+
+ANOMALY_KINDS = (
+    ('transaksi', 'Total transaksi per kasir'),
+    ('item', 'Qty per produk'),
+    ('pengeluaran', 'Pengeluaran per kasir'),
+)
+
+
+class AnomalyStat(models.Model):
+    kind = models.CharField(max_length=20, choices=ANOMALY_KINDS)
+
+    # Kasir id for transaksi/pengeluaran, KantinProduct id for item.
+    key = models.PositiveBigIntegerField()
+
+    mean = models.FloatField(default=0)
+
+    variance = models.FloatField(default=0)
+
+    count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'key')
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} ({self.count})"
+
+
+class AnomalyAlert(models.Model):
+    kind = models.CharField(max_length=20, choices=ANOMALY_KINDS)
+
+    key = models.PositiveBigIntegerField()
+
+    label = models.CharField(max_length=255)
+
+    nilai = models.DecimalField(max_digits=14, decimal_places=2)
+
+    perkiraan = models.DecimalField(max_digits=14, decimal_places=2)
+
+    skor = models.FloatField()
+
+    transaction = models.ForeignKey(
+        'transactions.Transaction',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+
+    expense = models.ForeignKey(
+        'expenses.Expense',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+
+    ditinjau = models.BooleanField(default=False)
+
+    ditinjau_oleh = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ditinjau', 'created_at'], name='anomaly_alert_open_idx'),
+            models.Index(fields=['created_at'], name='anomaly_alert_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.label}: {self.nilai} (skor {self.skor:.1f})"
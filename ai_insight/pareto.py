@@ -0,0 +1,91 @@
+import numpy as np
+from django.db.models import Max, Sum
+
+from reports.models import DailyProductSales
+
+
+# Share of the total covered by class A, then by A and B together.
+BATAS_A = 0.8
+BATAS_B = 0.95
+
+
+def classify(values):
+    """
+    ABC class of every entry of ``values`` plus its share and cumulative share
+    when sorted descending. An entry is A while the share of everything ranked
+    above it is below ``BATAS_A`` (so the top seller is always A), B below
+    ``BATAS_B``, C otherwise; with nothing sold everything is C.
+    """
+    values = np.asarray(values, dtype=float)
+    total = values.sum()
+    order = np.argsort(-values, kind='stable')
+
+    share = np.divide(values, total, out=np.zeros_like(values), where=total > 0)
+    cumulative = np.empty_like(values)
+    cumulative[order] = share[order].cumsum()
+    before = cumulative - share
+
+    kelas = np.where(before < BATAS_A, 'A', np.where(before < BATAS_B, 'B', 'C'))
+    kelas[values <= 0] = 'C'
+    return kelas, share, cumulative
+
+
+def _ringkasan(kelas, values):
+    total = values.sum()
+    return {
+        k: {
+            'jumlah_produk': int((kelas == k).sum()),
+            'persen': round(float(values[kelas == k].sum() / total * 100), 2) if total else 0.0,
+        }
+        for k in 'ABC'
+    }
+
+
+def klasifikasi(start, end):
+    """
+    ABC classes by revenue and by quantity for every product sold between
+    ``start`` and ``end`` (inclusive): one grouped query on the daily product
+    rollup and one vectorised pass per measure. Sales of deleted products are
+    left out, since they cannot be restocked. Rows come sorted by revenue.
+    """
+    rows = list(
+        DailyProductSales.objects
+        .filter(tanggal__gte=start, tanggal__lte=end, product__isnull=False)
+        .values('product_id')
+        .annotate(
+            nama=Max('product_name'),
+            kategori=Max('product_category'),
+            qty=Sum('qty'),
+            pendapatan=Sum('pendapatan')
+        )
+        .order_by()
+    )
+
+    qty = np.array([row['qty'] for row in rows], dtype=float)
+    pendapatan = np.array([row['pendapatan'] for row in rows], dtype=float)
+    kelas_pendapatan, share_pendapatan, kumulatif = classify(pendapatan)
+    kelas_qty, share_qty, _ = classify(qty)
+
+    produk = [
+        {
+            'produk_id': rows[i]['product_id'],
+            'produk': rows[i]['nama'],
+            'kategori': rows[i]['kategori'],
+            'total_terjual': rows[i]['qty'],
+            'total_pendapatan': rows[i]['pendapatan'],
+            'kelas_pendapatan': str(kelas_pendapatan[i]),
+            'persen_pendapatan': round(float(share_pendapatan[i] * 100), 2),
+            'kumulatif_pendapatan': round(float(kumulatif[i] * 100), 2),
+            'kelas_qty': str(kelas_qty[i]),
+            'persen_qty': round(float(share_qty[i] * 100), 2),
+        }
+        for i in np.argsort(-pendapatan, kind='stable')
+    ]
+
+    return {
+        'ringkasan': {
+            'pendapatan': _ringkasan(kelas_pendapatan, pendapatan),
+            'qty': _ringkasan(kelas_qty, qty),
+        },
+        'produk': produk,
+    }
@@ -1,3 +1,436 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from produks.models import KantinProduct
+from reports.models import DailyProductSales
+from reports.tests import ApiTestCase, QueryPlanTestCase, ReportDataTestCase, local
+from transactions.models import Transaction
+from .anomalies import WARMUP
+from .baskets import mine
+from .forecasting import (
+    HORIZON_DAYS, LEAD_TIME_DAYS, REVIEW_DAYS, days_until_empty, forecast, latest_forecast,
+    reorder_quantity, smoothed_level, take_snapshot, weekday_index
+)
+from .models import AnomalyAlert, AnomalyStat, ForecastSnapshot, ProductForecast
+from .pareto import classify
+
+
+class ForecastEngineTests(SimpleTestCase):
+    def test_smoothed_level_matches_recursive_smoothing(self):
+        # s = x0, then s = 0.3 * x + 0.7 * s: 1 -> 1.3 -> 1.81
+        self.assertAlmostEqual(smoothed_level(np.array([[1.0, 2.0, 3.0]]))[0], 1.81)
+
+    def test_weekday_index_is_shrunk_towards_one(self):
+        # Two weeks from a Monday selling 8 on Mondays and 1 otherwise: the
+        # average day sells 2, so raw indices 4 and 0.5 shrink halfway to 1.
+        matrix = np.array([[8.0, 1, 1, 1, 1, 1, 1] * 2])
+        season = weekday_index(matrix, np.arange(14) % 7)
+        np.testing.assert_allclose(season[0], [2.5] + [0.75] * 6)
+
+    def test_forecast_carries_seasonality_into_the_future(self):
+        hasil = forecast(np.array([[8.0, 1, 1, 1, 1, 1, 1] * 2]), date(2024, 3, 4), np.array([100.0]))
+
+        # The horizon starts on a Monday again.
+        self.assertAlmostEqual(hasil['daily'][0, 0] / hasil['daily'][0, 1], 2.5 / 0.75)
+        self.assertAlmostEqual(hasil['daily'][0, 7], hasil['daily'][0, 0])
+
+    def test_flat_demand(self):
+        hasil = forecast(np.full((1, 28), 7.0), date(2024, 3, 4), np.array([20.0]))
+
+        self.assertAlmostEqual(hasil['level'][0], 7)
+        self.assertAlmostEqual(hasil['safety'][0], 0)
+        # 7 + 7 = 14 by day 2, the last 6 units go 6/7 into day 3.
+        self.assertAlmostEqual(hasil['days_until_empty'][0], 2 + 6 / 7)
+        self.assertEqual(hasil['reorder'][0], 7 * (LEAD_TIME_DAYS + REVIEW_DAYS) - 20)
+
+    def test_days_until_empty(self):
+        daily = np.array([[1.0, 1, 1], [0, 0, 0], [2, 2, 2]])
+        np.testing.assert_allclose(days_until_empty(daily, np.array([5.0, 5, 3])), [5, np.inf, 1.5])
+
+    def test_negligible_demand_never_runs_out(self):
+        daily = np.array([np.full(HORIZON_DAYS, 1e-5), np.full(HORIZON_DAYS, 0.5)])
+        self.assertTrue(np.isinf(days_until_empty(daily, np.array([100.0, 1000.0]))).all())
+
+    def test_reorder_quantity(self):
+        # 9 days at 2 a day plus 3.5 safety, less 5 in stock: 16.5, rounded up.
+        daily = np.full((2, HORIZON_DAYS), 2.0)
+        np.testing.assert_array_equal(
+            reorder_quantity(daily, np.array([3.5, 0]), np.array([5.0, 50])),
+            [17, 0]
+        )
+
+
+class StockoutPredictionTests(ApiTestCase):
+    def test_single_old_sale_is_no_real_demand(self):
+        product = self.make_product('Roti', stock_kantin=100)
+        DailyProductSales.objects.create(
+            tanggal=timezone.localdate() - timedelta(days=30), product=product, product_name='Roti', qty=1
+        )
+
+        response = self.request(self.admin, 'get', '/api/ai/prediksi-habis/')
+
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data['prediksi']
+        self.assertEqual(
+            (row['estimasi_habis_hari'], row['tanggal_habis'], row['status']),
+            (999, None, 'Tidak Ada Penjualan')
+        )
+
+
+class ForecastSnapshotTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.roti = self.make_product('Roti', stock_kantin=10)
+
+    def snapshot(self, days_ago):
+        snapshot = ForecastSnapshot.objects.create(
+            tanggal=timezone.localdate() - timedelta(days=days_ago),
+            lookback_days=56,
+            horizon_days=HORIZON_DAYS
+        )
+        # 1, 2, 3, ... units a day from the snapshot date, so the shift shows.
+        ProductForecast.objects.create(
+            snapshot=snapshot,
+            product=self.roti,
+            stock_at_snapshot=50,
+            daily_rate=5,
+            moving_average=4,
+            safety_stock=0,
+            daily_forecast=list(range(1, HORIZON_DAYS + 1))
+        )
+        return snapshot
+
+    def test_curve_is_shifted_to_today_and_rescored_against_stock(self):
+        snapshot = self.snapshot(days_ago=3)
+        baru = self.make_product('Kopi', stock_kantin=5)
+
+        products, hasil, used = latest_forecast()
+
+        self.assertEqual(used, snapshot)
+        self.assertEqual([kp.id for kp in products], [self.roti.id, baru.id])
+        np.testing.assert_array_equal(hasil['daily'][0], range(4, HORIZON_DAYS + 1))
+        # 4 + 5 = 9 units in two days, the last one 1/6 into the third.
+        self.assertAlmostEqual(hasil['days_until_empty'][0], 2 + 1 / 6)
+        # Days 4..12 of the curve sum to 72, against 10 in stock.
+        self.assertEqual(hasil['reorder'][0], 62)
+        # Added after the snapshot: no forecast yet.
+        self.assertEqual((hasil['level'][1], hasil['reorder'][1]), (0, 0))
+        self.assertTrue(np.isinf(hasil['days_until_empty'][1]))
+
+        KantinProduct.objects.filter(pk=self.roti.pk).update(stock_kantin=100)
+        self.assertEqual(latest_forecast()[1]['reorder'][0], 0)
+
+    def test_endpoints_read_the_snapshot(self):
+        snapshot = self.snapshot(days_ago=3)
+
+        [rekomendasi] = self.request(self.admin, 'get', '/api/ai/rekomendasi-stok/').data['rekomendasi']
+        prediksi = self.request(self.admin, 'get', '/api/ai/prediksi-habis/').data
+
+        self.assertEqual((rekomendasi['prediksi_per_hari'], rekomendasi['jumlah_tambah']), (5, 62))
+        self.assertEqual(prediksi['dihitung_pada'], snapshot.created_at)
+        [row] = prediksi['prediksi']
+        self.assertEqual(
+            (row['estimasi_habis_hari'], row['tanggal_habis'], row['status']),
+            (2, timezone.localdate() + timedelta(days=2), 'Segera Habis')
+        )
+
+    def test_negligible_snapshot_demand_has_no_stockout_date(self):
+        snapshot = self.snapshot(days_ago=0)
+        snapshot.forecasts.update(daily_rate=0.004, daily_forecast=[0.004] * HORIZON_DAYS)
+        KantinProduct.objects.filter(pk=self.roti.pk).update(stock_kantin=100)
+
+        response = self.request(self.admin, 'get', '/api/ai/prediksi-habis/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['prediksi'][0]['tanggal_habis'], None)
+
+    def test_stale_snapshot_falls_back_to_live_forecast(self):
+        # The shifted curve must still cover lead time plus one review period.
+        covered = HORIZON_DAYS - LEAD_TIME_DAYS - REVIEW_DAYS
+        snapshot = self.snapshot(days_ago=covered)
+        self.assertEqual(latest_forecast()[2], snapshot)
+
+        ForecastSnapshot.objects.filter(pk=snapshot.pk).update(tanggal=snapshot.tanggal - timedelta(days=1))
+        products, hasil, used = latest_forecast()
+
+        self.assertIsNone(used)
+        self.assertEqual(hasil['daily'].shape, (1, HORIZON_DAYS))
+        # Live, from the (empty) sales history.
+        self.assertEqual(hasil['level'][0], 0)
+        [rekomendasi] = self.request(self.admin, 'get', '/api/ai/rekomendasi-stok/').data['rekomendasi']
+        self.assertEqual(rekomendasi['alasan'], 'Tidak ada penjualan')
+
+
+class SalesInsightTests(ReportDataTestCase):
+    def insight(self, **params):
+        return self.request(self.admin, 'get', '/api/ai/insight-penjualan/', params)
+
+    def ranking(self, **params):
+        return [(p['produk'], p['total_terjual'], p['total_pendapatan']) for p in self.insight(**params).data['insight']]
+
+    def test_all_time_ordering(self):
+        self.assertEqual(self.ranking(), [('Es Teh', 8, 24000), ('Roti', 6, 30000)])
+        self.assertEqual(self.ranking(order_by='revenue'), [('Roti', 6, 30000), ('Es Teh', 8, 24000)])
+
+    def test_window_and_limit(self):
+        self.assertEqual(
+            self.ranking(start='2024-03-01', end='2024-03-31'),
+            [('Roti', 6, 30000), ('Es Teh', 3, 9000)]
+        )
+        self.assertEqual(self.ranking(start='2024-04-01', end='2024-04-30'), [('Es Teh', 5, 15000)])
+        self.assertEqual(self.ranking(start='2024-03-01', end='2024-03-31', limit=1), [('Roti', 6, 30000)])
+
+    def test_invalid_params(self):
+        for params in (
+            {'order_by': 'nama'},
+            {'start': '2024-02-30', 'end': '2024-03-31'},
+            {'start': 'kemarin'},
+            {'limit': 'sepuluh'},
+        ):
+            response = self.insight(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+    def test_window_is_cached_until_a_sale_in_it(self):
+        window = {'start': '2024-03-01', 'end': '2024-03-31'}
+        first = self.insight(**window)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.insight(**window)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(
+            self.request(self.admin, 'get', '/api/ai/insight-penjualan/', window, HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+            304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sell(self.kasir, local(2024, 3, 20, 10, 0), 5000, (self.roti, 1))
+
+        self.assertEqual(self.ranking(**window)[0], ('Roti', 7, 35000))
+
+
+class ParetoTests(SimpleTestCase):
+    def test_classify(self):
+        # Sorted shares 50, 30, 10, 6, 4: A while what ranks above is under
+        # 80%, B under 95%, so the item that crosses a bound keeps the class.
+        kelas, share, cumulative = classify([4, 50, 10, 30, 6])
+
+        self.assertEqual(list(kelas), ['C', 'A', 'B', 'A', 'B'])
+        np.testing.assert_allclose(share, [0.04, 0.5, 0.1, 0.3, 0.06])
+        np.testing.assert_allclose(cumulative, [1.0, 0.5, 0.9, 0.8, 0.96])
+
+    def test_nothing_sold_is_all_c(self):
+        self.assertEqual(list(classify([0, 0])[0]), ['C', 'C'])
+        self.assertEqual(list(classify([10, 0])[0]), ['A', 'C'])
+
+
+class AbcClassificationTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # (revenue, qty) in March; Kopi sells nothing.
+        penjualan = {'P1': (50000, 5), 'P2': (30000, 50), 'P3': (10000, 10), 'P4': (6000, 30), 'P5': (4000, 5)}
+        cls.products = {name: cls.make_product(name, stock_kantin=7) for name in [*penjualan, 'Kopi']}
+
+        rows = [
+            DailyProductSales(
+                tanggal=date(2024, 3, 10), product=cls.products[name], product_name=name,
+                product_category='Makanan', qty=qty, pendapatan=pendapatan
+            )
+            for name, (pendapatan, qty) in penjualan.items()
+        ]
+        rows += [
+            # Outside the window, and a deleted product.
+            DailyProductSales(tanggal=date(2024, 2, 10), product=cls.products['P5'], product_name='P5', qty=1, pendapatan=10 ** 6),
+            DailyProductSales(tanggal=date(2024, 3, 10), product=None, product_name='Lama', qty=1, pendapatan=10 ** 6),
+        ]
+        DailyProductSales.objects.bulk_create(rows)
+
+    def klasifikasi(self, **params):
+        return self.request(self.admin, 'get', '/api/ai/klasifikasi-abc/', {'start': '2024-03-01', 'end': '2024-03-31', **params})
+
+    def test_classes_and_shares(self):
+        data = self.klasifikasi().data
+
+        self.assertEqual(
+            [(p['produk'], p['kelas_pendapatan'], p['kumulatif_pendapatan'], p['kelas_qty']) for p in data['produk']],
+            [
+                ('P1', 'A', 50.0, 'B'),
+                ('P2', 'A', 80.0, 'A'),
+                ('P3', 'B', 90.0, 'B'),
+                ('P4', 'B', 96.0, 'A'),
+                ('P5', 'C', 100.0, 'C'),
+            ]
+        )
+        self.assertEqual(data['ringkasan']['pendapatan'], {
+            'A': {'jumlah_produk': 2, 'persen': 80.0},
+            'B': {'jumlah_produk': 2, 'persen': 16.0},
+            'C': {'jumlah_produk': 1, 'persen': 4.0},
+        })
+
+    def test_stock_join_adds_unsold_products_as_c(self):
+        data = self.klasifikasi(stok=1).data
+
+        self.assertEqual([p['stock_kantin'] for p in data['produk']], [7] * 6)
+        unsold = data['produk'][-1]
+        self.assertEqual(
+            (unsold['produk'], unsold['total_terjual'], unsold['kelas_pendapatan'], unsold['kelas_qty']),
+            ('Kopi', 0, 'C', 'C')
+        )
+        self.assertEqual(data['ringkasan']['pendapatan']['C']['jumlah_produk'], 2)
+        self.assertEqual(data['ringkasan']['qty']['C']['jumlah_produk'], 2)
+
+        # The classes are cached, the stock is not.
+        KantinProduct.objects.filter(pk=self.products['P1'].pk).update(stock_kantin=3)
+        self.assertEqual(self.klasifikasi(stok=1).data['produk'][0]['stock_kantin'], 3)
+
+    def test_invalid_period(self):
+        for params in ({'start': '2024-03-31', 'end': '2024-03-01'}, {'end': '2024-02-30'}, {'start': 'kemarin'}):
+            response = self.klasifikasi(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+
+class BasketRuleTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.roti = cls.make_product('Roti')
+        cls.teh = cls.make_product('Es Teh')
+
+    def setUp(self):
+        super().setUp()
+        self.pay(self.kasir, [(self.roti, 1), (self.teh, 1)], 2000)
+        self.pay(self.kasir, [(self.roti, 1), (self.teh, 1)], 2000)
+        self.pay(self.kasir, [(self.roti, 1)], 1000)
+        mine()
+
+    def rules(self, **params):
+        return self.request(self.admin, 'get', '/api/ai/sering-dibeli-bersama/', params)
+
+    def test_min_support_filters_pairs(self):
+        data = self.rules(product=self.roti.id, min_support='0.5').data
+        self.assertEqual(data['total_transaksi'], 3)
+        self.assertEqual(
+            [(r['dibeli_bersama_id'], r['support'], r['confidence']) for r in data['rules']],
+            [(self.teh.id, 0.6667, 0.6667)]
+        )
+        self.assertEqual(self.rules(min_support='1').data['rules'], [])
+
+    def test_invalid_min_support(self):
+        for value in ('nan', 'inf', '-0.1', '1.5', 'x'):
+            response = self.rules(min_support=value)
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('error', response.data)
+
+
+class AnomalyTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.roti = cls.make_product('Roti', stock_kantin=100)
+
+    def test_detection_runs_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.pay(self.kasir, [(self.roti, 1)], 1000).status_code, 201)
+        self.assertFalse(AnomalyStat.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            set(AnomalyStat.objects.values_list('kind', 'key', 'count')),
+            {('transaksi', self.kasir.id, 1), ('item', self.roti.id, 1)}
+        )
+
+    def test_outlier_raises_alerts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(WARMUP):
+                self.pay(self.kasir, [(self.roti, 1)], 1000)
+        self.assertFalse(AnomalyAlert.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pay(self.kasir, [(self.roti, 30)], 30000)
+
+        self.assertEqual(set(AnomalyAlert.objects.values_list('kind', 'key')), {
+            ('transaksi', self.kasir.id),
+            ('item', self.roti.id),
+        })
+        data = self.request(self.admin, 'get', '/api/ai/anomali/', {'kind': 'item'}).data
+        self.assertEqual([a['label'] for a in data['anomali']], ['Roti'])
+
+    def test_alerts_are_marked_reviewed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(WARMUP):
+                self.pay(self.kasir, [(self.roti, 1)], 1000)
+            self.pay(self.kasir, [(self.roti, 30)], 30000)
+        ids = list(AnomalyAlert.objects.values_list('id', flat=True))
+
+        response = self.request(self.admin, 'post', '/api/ai/anomali/', {'ids': ids})
+
+        self.assertEqual(response.data, {'status': True, 'ditinjau': 2})
+        self.assertEqual(self.request(self.admin, 'get', '/api/ai/anomali/').data['anomali'], [])
+        for ids in (['x'], [1.5], [True], '1,2', {'id': 1}):
+            response = self.request(self.admin, 'post', '/api/ai/anomali/', {'ids': ids})
+            self.assertEqual(response.status_code, 400, ids)
+
+    def test_failure_never_reaches_the_write(self):
+        with mock.patch('ai_insight.anomalies._detect', side_effect=RuntimeError('boom')), \
+                self.assertLogs('ai_insight.anomalies', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            sale = self.pay(self.kasir, [(self.roti, 1)], 1000)
+            expense = self.request(self.kasir, 'post', '/api/pengeluaran/', {'deskripsi': 'Gas', 'jumlah': 20000})
+
+        self.assertEqual(sale.status_code, 201)
+        self.assertEqual(expense.status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.roti.refresh_from_db()
+        self.assertEqual(self.roti.stock_kantin, 99)
+
+
+class InsightQueryPlanTests(QueryPlanTestCase):
+    def test_insight_penjualan(self):
+        # All-time ranking over the rollup table, read in full by design.
+        self.assertIndexed(self.admin, '/api/ai/insight-penjualan/', allow=['reports_dailyproductsales'])
+
+    def test_insight_penjualan_window(self):
+        for order_by in ('qty', 'revenue'):
+            self.assertIndexed(self.admin, '/api/ai/insight-penjualan/', {
+                'start': (self.today - timedelta(days=7)).isoformat(),
+                'end': self.today.isoformat(),
+                'limit': 10,
+                'order_by': order_by
+            })
+
+    def test_rekomendasi_stok(self):
+        self.assertIndexed(self.admin, '/api/ai/rekomendasi-stok/')
+
+    def test_prediksi_barang_habis(self):
+        self.assertIndexed(self.admin, '/api/ai/prediksi-habis/')
+
+    def test_forecast_snapshot(self):
+        take_snapshot()
+        self.assertIndexed(self.admin, '/api/ai/rekomendasi-stok/')
+        self.assertIndexed(self.admin, '/api/ai/prediksi-habis/')
+
+    def test_sering_dibeli_bersama(self):
+        mine()
+        self.assertIndexed(self.admin, '/api/ai/sering-dibeli-bersama/')
+        self.assertIndexed(self.admin, '/api/ai/sering-dibeli-bersama/', {'product': self.products[0].id})
+
+    def test_anomali(self):
+        self.assertIndexed(self.admin, '/api/ai/anomali/')
+        self.assertIndexed(self.admin, '/api/ai/anomali/', {'kind': 'transaksi'})
+
+    def test_klasifikasi_abc(self):
+        self.assertIndexed(self.admin, '/api/ai/klasifikasi-abc/')
+        self.assertIndexed(self.admin, '/api/ai/klasifikasi-abc/', {
+            'start': (self.today - timedelta(days=7)).isoformat(),
+            'end': self.today.isoformat(),
+            'stok': 1
+        })
@@ -2,11 +2,17 @@ from django.urls import path
 from .views import (
     insight_penjualan,
     rekomendasi_stok,
-    prediksi_barang_habis
+    prediksi_barang_habis,
+    sering_dibeli_bersama,
+    anomali,
+    klasifikasi_abc
 )
 
 urlpatterns = [
     path('ai/insight-penjualan/', insight_penjualan),
     path('ai/rekomendasi-stok/', rekomendasi_stok),
     path('ai/prediksi-habis/', prediksi_barang_habis),
+    path('ai/sering-dibeli-bersama/', sering_dibeli_bersama),
+    path('ai/anomali/', anomali),
+    path('ai/klasifikasi-abc/', klasifikasi_abc),
 ]
@@ -4,101 +4,292 @@ from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.db.models import Sum
-from datetime import timedelta, date
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+import math
+import numpy as np
 
-from transactions.models import TransactionItem
 from produks.models import KantinProduct
+from reports.cache import cached_report
+from reports.models import DailyProductSales
+from .baskets import rules
+from .models import AnomalyAlert
+from .pareto import klasifikasi
+from .forecasting import LEAD_TIME_DAYS, MAX_HABIS_HARI, REVIEW_DAYS, SEGERA_HABIS_HARI, latest_forecast
 from .permissions import IsAdmin
 
+
+MAX_INSIGHT_LIMIT = 100
+MAX_ANOMALI = 100
+ABC_HARI_DEFAULT = 30
+
+INSIGHT_ORDER = {
+    'qty': ('-total_qty', 'product_name'),
+    'revenue': ('-total_pendapatan', 'product_name'),
+}
+
+
+def _periode_insight(request):
+    start = parse_date(request.query_params.get('start') or '')
+    end = parse_date(request.query_params.get('end') or '')
+    if start is None or end is None or start > end:
+        return None
+    return start, end
+
+
 @api_view(['GET'])
 @permission_classes([IsAdmin])
+@cached_report('insight', _periode_insight)
 def insight_penjualan(request):
+    params = request.query_params
+
+    order_by = params.get('order_by', 'qty')
+    if order_by not in INSIGHT_ORDER:
+        return Response({'error': 'order_by harus qty atau revenue'}, status=400)
+
+    try:
+        start = parse_date(params['start']) if params.get('start') else None
+        end = parse_date(params['end']) if params.get('end') else None
+        limit = max(1, min(int(params['limit']), MAX_INSIGHT_LIMIT)) if params.get('limit') else None
+    except ValueError:
+        return Response({'error': 'start, end atau limit tidak valid'}, status=400)
+    if (params.get('start') and start is None) or (params.get('end') and end is None):
+        return Response({'error': 'start dan end harus YYYY-MM-DD'}, status=400)
+
+    data = DailyProductSales.objects.all()
+    if start:
+        data = data.filter(tanggal__gte=start)
+    if end:
+        data = data.filter(tanggal__lte=end)
+
     data = (
-        TransactionItem.objects
-        .values('product__product_gudang__name')
+        data
+        .values('product_name')
         .annotate(
             total_qty=Sum('qty'),
-            total_pendapatan=Sum('subtotal')
+            total_pendapatan=Sum('pendapatan')
         )
-        .order_by('-total_qty')
+        .order_by(*INSIGHT_ORDER[order_by])
     )
+    if limit:
+        data = data[:limit]
 
     result = []
     for d in data:
         result.append({
-            'produk': d['product__product_gudang__name'],
+            'produk': d['product_name'],
             'total_terjual': d['total_qty'],
             'total_pendapatan': d['total_pendapatan']
         })
 
     return Response({
         'status': True,
+        'start': start,
+        'end': end,
         'insight': result
     })
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def rekomendasi_stok(request):
-    rekomendasi = []
+    products, hasil, snapshot = latest_forecast()
 
-    for kp in KantinProduct.objects.select_related('product_gudang'):
-        total_terjual = (
-            TransactionItem.objects
-            .filter(product=kp)
-            .aggregate(total=Sum('qty'))['total'] or 0
-        )
+    rekomendasi = []
+    for i, kp in enumerate(products):
+        pesan = int(hasil['reorder'][i])
 
-        if total_terjual > 50:
-            saran = kp.stock_kantin + 20
-            alasan = 'Penjualan tinggi'
+        if hasil['level'][i] <= 0:
+            alasan = 'Tidak ada penjualan'
+        elif pesan > 0:
+            alasan = f'Stok tidak cukup untuk {LEAD_TIME_DAYS + REVIEW_DAYS} hari ke depan'
         else:
-            saran = kp.stock_kantin
-            alasan = 'Penjualan stabil'
+            alasan = 'Stok cukup'
 
         rekomendasi.append({
             'produk': kp.product_gudang.name,
             'stok_sekarang': kp.stock_kantin,
-            'saran_stok': saran,
+            'saran_stok': kp.stock_kantin + pesan,
+            'jumlah_tambah': pesan,
+            'prediksi_per_hari': round(float(hasil['level'][i]), 2),
+            'rata_rata_7_hari': round(float(hasil['moving_average'][i]), 2),
             'alasan': alasan
         })
 
     return Response({
         'status': True,
+        'dihitung_pada': snapshot.created_at if snapshot else timezone.now(),
         'rekomendasi': rekomendasi
     })
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def prediksi_barang_habis(request):
-    hasil = []
-    today = date.today()
-    last_7_days = today - timedelta(days=7)
-
-    for kp in KantinProduct.objects.select_related('product_gudang'):
-        total_7_hari = (
-            TransactionItem.objects.filter(
-                product=kp,
-                transaction__created_at__date__gte=last_7_days
-            ).aggregate(total=Sum('qty'))['total'] or 0
-        )
+    products, hasil, snapshot = latest_forecast()
+    today = timezone.localdate()
 
-        rata_per_hari = total_7_hari / 7 if total_7_hari > 0 else 0
+    prediksi = []
+    for i, kp in enumerate(products):
+        sisa_hari = hasil['days_until_empty'][i]
 
-        if rata_per_hari > 0:
-            estimasi_habis = int(kp.stock_kantin / rata_per_hari)
-            status = 'Segera Habis' if estimasi_habis <= 3 else 'Aman'
-        else:
+        if not np.isfinite(sisa_hari) or sisa_hari > MAX_HABIS_HARI:
             estimasi_habis = 999
+            tanggal_habis = None
             status = 'Tidak Ada Penjualan'
+        else:
+            estimasi_habis = int(sisa_hari)
+            tanggal_habis = today + timedelta(days=estimasi_habis)
+            status = 'Segera Habis' if estimasi_habis <= SEGERA_HABIS_HARI else 'Aman'
 
-        hasil.append({
+        prediksi.append({
             'produk': kp.product_gudang.name,
             'stok_sekarang': kp.stock_kantin,
+            'prediksi_per_hari': round(float(hasil['level'][i]), 2),
             'estimasi_habis_hari': estimasi_habis,
+            'tanggal_habis': tanggal_habis,
             'status': status
         })
 
     return Response({
         'status': True,
-        'prediksi': hasil
+        'dihitung_pada': snapshot.created_at if snapshot else timezone.now(),
+        'prediksi': prediksi
     })
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def sering_dibeli_bersama(request):
+    try:
+        product_id = int(request.query_params['product']) if request.query_params.get('product') else None
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 100))
+        min_support = float(request.query_params.get('min_support', 0))
+        if not math.isfinite(min_support) or not 0 <= min_support <= 1:
+            raise ValueError(min_support)
+    except ValueError:
+        return Response({'error': 'product, limit atau min_support tidak valid'}, status=400)
+
+    state, hasil = rules(product_id, limit, min_support)
+
+    return Response({
+        'status': True,
+        'total_transaksi': state.total_transaksi if state else 0,
+        'diperbarui_pada': state.updated_at if state else None,
+        'rules': hasil
+    })
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdmin])
+def anomali(request):
+    if request.method == 'POST':
+        ids = request.data.get('ids') or []
+        if not isinstance(ids, list) or any(isinstance(i, bool) or not isinstance(i, int) for i in ids):
+            return Response({'error': 'ids harus berupa list id (angka)'}, status=400)
+
+        updated = AnomalyAlert.objects.filter(id__in=ids, ditinjau=False).update(
+            ditinjau=True,
+            ditinjau_oleh=request.user
+        )
+        return Response({'status': True, 'ditinjau': updated})
+
+    params = request.query_params
+    alerts = AnomalyAlert.objects.all()
+    if params.get('semua') not in ('1', 'true'):
+        alerts = alerts.filter(ditinjau=False)
+    if params.get('kind'):
+        alerts = alerts.filter(kind=params['kind'])
+
+    alerts = alerts.order_by('-created_at', '-id')[:MAX_ANOMALI]
+
+    return Response({
+        'status': True,
+        'anomali': [
+            {
+                'id': alert.id,
+                'jenis': alert.kind,
+                'label': alert.label,
+                'nilai': alert.nilai,
+                'perkiraan': alert.perkiraan,
+                'skor': alert.skor,
+                'transaction_id': alert.transaction_id,
+                'expense_id': alert.expense_id,
+                'ditinjau': alert.ditinjau,
+                'created_at': alert.created_at
+            }
+            for alert in alerts
+        ]
+    })
+
+def _periode_abc(request):
+    params = request.query_params
+    end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+    if end is None:
+        return None
+    start = parse_date(params['start']) if params.get('start') else end - timedelta(days=ABC_HARI_DEFAULT - 1)
+    if start is None or start > end:
+        return None
+    return start, end
+
+
+@cached_report('abc', _periode_abc)
+def _klasifikasi_abc(request):
+    start, end = _periode_abc(request)
+    return Response({
+        'status': True,
+        'start': start,
+        'end': end,
+        **klasifikasi(start, end)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def klasifikasi_abc(request):
+    try:
+        periode = _periode_abc(request)
+    except ValueError:
+        periode = None
+    if periode is None:
+        return Response({'error': 'start dan end harus YYYY-MM-DD dan start <= end'}, status=400)
+
+    response = _klasifikasi_abc(request)
+    if response.status_code != 200 or request.query_params.get('stok') not in ('1', 'true'):
+        return response
+
+    # Stock is joined after the cache so it is always current; products
+    # without sales in the window are listed as C.
+    data = response.data
+    stok = {
+        pk: (nama, kategori, kantin, gudang)
+        for pk, nama, kategori, kantin, gudang in KantinProduct.objects.values_list(
+            'id', 'product_gudang__name', 'product_gudang__category', 'stock_kantin', 'product_gudang__stock_gudang'
+        )
+    }
+
+    produk = []
+    for p in data['produk']:
+        _, _, kantin, gudang = stok.get(p['produk_id'], (None, None, None, None))
+        produk.append({**p, 'stock_kantin': kantin, 'stock_gudang': gudang})
+
+    terjual = {p['produk_id'] for p in produk}
+    tidak_terjual = sorted((pk, row) for pk, row in stok.items() if pk not in terjual)
+    for pk, (nama, kategori, kantin, gudang) in tidak_terjual:
+        produk.append({
+            'produk_id': pk,
+            'produk': nama,
+            'kategori': kategori,
+            'total_terjual': 0,
+            'total_pendapatan': 0,
+            'kelas_pendapatan': 'C',
+            'persen_pendapatan': 0.0,
+            'kumulatif_pendapatan': 100.0 if terjual else 0.0,
+            'kelas_qty': 'C',
+            'persen_qty': 0.0,
+            'stock_kantin': kantin,
+            'stock_gudang': gudang
+        })
+
+    ringkasan = {
+        ukuran: {**kelas, 'C': {**kelas['C'], 'jumlah_produk': kelas['C']['jumlah_produk'] + len(tidak_terjual)}}
+        for ukuran, kelas in data['ringkasan'].items()
+    }
+    return Response({**data, 'ringkasan': ringkasan, 'produk': produk})
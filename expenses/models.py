@@ -14,5 +14,11 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['tanggal', 'created_at'], name='expense_tanggal_created_idx'),
+            models.Index(fields=['created_at'], name='expense_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.deskripsi} - {self.jumlah}"
@@ -1,3 +1,13 @@
-from django.test import TestCase
+from reports.tests import QueryPlanTestCase
 
-# Create your tests here.
+
+class ExpenseQueryPlanTests(QueryPlanTestCase):
+    def test_list_pengeluaran(self):
+        self.assertIndexed(self.admin, '/api/pengeluaran/list/')
+        self.assertIndexed(self.admin, '/api/pengeluaran/list/', {'date': self.today.isoformat()})
+
+    def test_tambah_pengeluaran(self):
+        self.assertIndexed(self.kasir, '/api/pengeluaran/', {
+            'deskripsi': 'Gas',
+            'jumlah': 20000
+        }, method='post')
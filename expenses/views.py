@@ -4,6 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
+from django.db import transaction as db_transaction
+from ai_insight.anomalies import observe_expense
+from reports.rollups import record_expense
 from .models import Expense
 from .serializers import ExpenseSerializer, ExpenseCreateSerializer
 
@@ -23,7 +26,10 @@ class IsAdmin(BasePermission):
 def tambah_pengeluaran(request):
     serializer = ExpenseCreateSerializer(data=request.data)
     if serializer.is_valid():
-        expense = serializer.save(user=request.user)
+        with db_transaction.atomic():
+            expense = serializer.save(user=request.user)
+            record_expense(expense)
+            observe_expense(expense)
         response_serializer = ExpenseSerializer(expense)
         return Response({
             'status': True,
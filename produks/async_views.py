@@ -0,0 +1,40 @@
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from users.authentication import aauthenticate
+from .models import KantinProduct
+
+
+def _timestamp(value):
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+async def kantin_produk_list(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    user = await aauthenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if user.role not in ['admin', 'kasir']:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+    products = []
+    async for kp in KantinProduct.objects.select_related('product_gudang').order_by('id'):
+        gudang = kp.product_gudang
+        products.append({
+            'id': kp.id,
+            'product_gudang': gudang.id,
+            'name': gudang.name,
+            'category': gudang.category,
+            'price': str(gudang.price),
+            'stock_kantin': kp.stock_kantin,
+            'satuan': gudang.satuan,
+            'image': request.build_absolute_uri(gudang.image.url) if gudang.image else None,
+            'created_at': _timestamp(kp.created_at),
+            'updated_at': _timestamp(kp.updated_at),
+        })
+
+    return JsonResponse(products, encoder=JSONEncoder, safe=False)
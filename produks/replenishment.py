@@ -0,0 +1,155 @@
+import numpy as np
+from django.db import transaction as db_transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from ai_insight.forecasting import LEAD_TIME_DAYS, days_until_empty, latest_forecast, reorder_quantity
+from .models import GudangProduct, KantinProduct
+
+
+class TransferError(Exception):
+    def __init__(self, message, detail=None):
+        super().__init__(message)
+        self.message = message
+        self.detail = detail or []
+
+
+def plan():
+    """
+    Propose the morning gudang -> kantin transfers, one row per gudang
+    product (the unit ``execute`` takes), with the forecasts of all its
+    kantin rows added up.
+
+    A product is due when its kantin stock is at or below its reorder point
+    (forecast demand over the lead time plus safety stock); it is then topped
+    up to cover one more review period, capped by what the gudang holds.
+    Products the gudang cannot supply at all are left out. Returns
+    ``(snapshot, rows)``, most urgent first.
+    """
+    products, hasil, snapshot = latest_forecast()
+    if not products:
+        return snapshot, []
+
+    # Products come ordered by id, so each gudang product's first kantin row
+    # is the one execute() credits.
+    gudang_ids, first, group = np.unique(
+        [kp.product_gudang_id for kp in products], return_index=True, return_inverse=True
+    )
+    stock = np.bincount(group, weights=[kp.stock_kantin for kp in products])
+    level = np.bincount(group, weights=hasil['level'])
+    safety = np.bincount(group, weights=hasil['safety'])
+    daily = np.zeros((len(gudang_ids), hasil['daily'].shape[1]))
+    np.add.at(daily, group, hasil['daily'])
+
+    reorder_point = np.ceil(daily[:, :LEAD_TIME_DAYS].sum(axis=1) + safety)
+    due = (level > 0) & (stock <= reorder_point)
+    butuh = reorder_quantity(daily, safety, stock)
+
+    rows = []
+    for i in np.argsort(days_until_empty(daily, stock), kind='stable'):
+        kp = products[first[i]]
+        jumlah = min(int(butuh[i]), kp.product_gudang.stock_gudang)
+        if not due[i] or jumlah < 1:
+            continue
+
+        rows.append({
+            'product_gudang_id': kp.product_gudang_id,
+            'kantin_product_id': kp.id,
+            'produk': kp.product_gudang.name,
+            'stock_kantin': int(stock[i]),
+            'stock_gudang': kp.product_gudang.stock_gudang,
+            'prediksi_per_hari': round(float(level[i]), 2),
+            'titik_pesan': int(reorder_point[i]),
+            'quantity': jumlah,
+            'kekurangan_gudang': int(butuh[i]) - jumlah,
+        })
+
+    return snapshot, rows
+
+
+@db_transaction.atomic
+def execute(items):
+    """
+    Move ``items`` (``[{'product_gudang_id', 'quantity'}]``) from gudang to
+    kantin all or nothing: after checking the gudang stock, one conditional
+    CASE update takes it off the gudang rows, missing kantin rows are created
+    in bulk, and a second CASE update adds it to the kantin rows. Raises
+    TransferError, leaving every stock untouched, when a product is unknown
+    or short.
+    """
+    quantities = {}
+    for item in items:
+        pk = item['product_gudang_id']
+        quantities[pk] = quantities.get(pk, 0) + item['quantity']
+
+    current = dict(
+        GudangProduct.objects
+        .select_for_update()
+        .filter(id__in=quantities.keys())
+        .values_list('id', 'stock_gudang')
+    )
+    detail = [
+        {
+            'product_gudang_id': pk,
+            'quantity': qty,
+            'stock_gudang': current.get(pk),
+            'error': 'Produk tidak ditemukan' if pk not in current else 'Stok gudang tidak cukup'
+        }
+        for pk, qty in quantities.items()
+        if current.get(pk, -1) < qty
+    ]
+    if detail:
+        raise TransferError('Stok gudang tidak cukup', detail)
+
+    enough_stock = Q()
+    for pk, qty in quantities.items():
+        enough_stock |= Q(id=pk, stock_gudang__gte=qty)
+
+    now = timezone.now()
+    updated = GudangProduct.objects.filter(enough_stock).update(
+        stock_gudang=Case(
+            *[When(id=pk, then=F('stock_gudang') - qty) for pk, qty in quantities.items()],
+            default=F('stock_gudang'),
+            output_field=PositiveIntegerField()
+        ),
+        updated_at=now
+    )
+    if updated != len(quantities):
+        raise TransferError('Stok gudang berubah, silakan ulangi')
+
+    # The oldest kantin row of each gudang product, as in plan().
+    kantin_ids = {}
+    for pk, gudang_id in (
+        KantinProduct.objects
+        .filter(product_gudang_id__in=quantities.keys())
+        .order_by('id')
+        .values_list('id', 'product_gudang_id')
+    ):
+        kantin_ids.setdefault(gudang_id, pk)
+
+    baru = KantinProduct.objects.bulk_create([
+        KantinProduct(product_gudang_id=gudang_id, stock_kantin=0)
+        for gudang_id in quantities
+        if gudang_id not in kantin_ids
+    ])
+    for kp in baru:
+        kantin_ids[kp.product_gudang_id] = kp.id
+
+    KantinProduct.objects.filter(id__in=kantin_ids.values()).update(
+        stock_kantin=Case(
+            *[
+                When(id=kantin_ids[gudang_id], then=F('stock_kantin') + qty)
+                for gudang_id, qty in quantities.items()
+            ],
+            default=F('stock_kantin'),
+            output_field=PositiveIntegerField()
+        ),
+        updated_at=now
+    )
+
+    return list(
+        KantinProduct.objects
+        .filter(id__in=kantin_ids.values())
+        .select_related('product_gudang')
+        .order_by('product_gudang_id')
+    )
@@ -27,6 +27,10 @@ class TransferStokSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1)
 
 
+class TransferBatchSerializer(serializers.Serializer):
+    items = TransferStokSerializer(many=True, allow_empty=False)
+
+
 class TambahStokGudangSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
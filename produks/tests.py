@@ -1,3 +1,106 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import Client
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from ai_insight.forecasting import LOOKBACK_DAYS
+from reports.models import DailyProductSales
+from reports.tests import ApiTestCase, QueryPlanTestCase
+from .models import GudangProduct, KantinProduct
+
+
+class AsyncCatalogTests(ApiTestCase):
+    def test_kantin_produk_list(self):
+        product = self.make_product('Roti', price=5000, stock_kantin=7)
+        token = Token.objects.create(user=self.kasir)
+
+        response = Client(HTTP_AUTHORIZATION=f'Token {token.key}').get('/api/async/kantin/produk/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(p['id'], p['name'], p['price'], p['stock_kantin']) for p in response.json()],
+            [(product.id, 'Roti', '5000.00', 7)]
+        )
+        self.assertEqual(Client().get('/api/async/kantin/produk/').status_code, 401)
+
+
+class RestockTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.laris = cls.make_product('Roti', stock_kantin=5, stock_gudang=50)
+        # A second kantin row on the same gudang product.
+        cls.laris_lain = KantinProduct.objects.create(product_gudang=cls.laris.product_gudang, stock_kantin=3)
+        cls.kosong = cls.make_product('Es Teh', stock_kantin=0, stock_gudang=0)
+        cls.sepi = cls.make_product('Kopi', stock_kantin=2, stock_gudang=100)
+
+        today = timezone.localdate()
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(tanggal=today - timedelta(days=day), product=kp, product_name=str(kp), qty=10)
+            for day in range(1, LOOKBACK_DAYS + 1)
+            for kp in (cls.laris, cls.laris_lain, cls.kosong)
+        ])
+
+    def restock(self, method='get', data=None):
+        return self.request(self.admin, method, '/api/kantin/stok/restock/', data)
+
+    def stocks(self):
+        return {
+            kp.id: (kp.stock_kantin, kp.product_gudang.stock_gudang)
+            for kp in KantinProduct.objects.select_related('product_gudang')
+        }
+
+    def test_plan_has_one_row_per_suppliable_gudang_product(self):
+        [row] = self.restock().data['rencana']
+
+        self.assertEqual(row['product_gudang_id'], self.laris.product_gudang_id)
+        self.assertEqual(row['kantin_product_id'], self.laris.id)
+        self.assertEqual(row['stock_kantin'], 8)
+        self.assertEqual(row['quantity'], 50)
+        self.assertGreater(row['kekurangan_gudang'], 0)
+
+    def test_plan_can_be_posted_back(self):
+        rencana = self.restock().data['rencana']
+
+        response = self.restock('post', {'items': [
+            {'product_gudang_id': row['product_gudang_id'], 'quantity': row['quantity']} for row in rencana
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        stocks = self.stocks()
+        self.assertEqual(stocks[self.laris.id], (55, 0))
+        self.assertEqual(stocks[self.laris_lain.id], (3, 0))
+
+    def test_shortage_rejects_the_whole_list(self):
+        before = self.stocks()
+
+        response = self.restock('post', {'items': [
+            {'product_gudang_id': self.laris.product_gudang_id, 'quantity': 5},
+            {'product_gudang_id': self.kosong.product_gudang_id, 'quantity': 1},
+            {'product_gudang_id': GudangProduct.objects.latest('id').id + 1, 'quantity': 1},
+        ]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(d['product_gudang_id'], d['error']) for d in response.data['detail']],
+            [
+                (self.kosong.product_gudang_id, 'Stok gudang tidak cukup'),
+                (GudangProduct.objects.latest('id').id + 1, 'Produk tidak ditemukan'),
+            ]
+        )
+        self.assertEqual(self.stocks(), before)
+
+
+class RestockQueryPlanTests(QueryPlanTestCase):
+    def test_restock_plan(self):
+        self.assertIndexed(self.admin, '/api/kantin/stok/restock/')
+
+    def test_restock_execute(self):
+        response = self.assertIndexed(self.admin, '/api/kantin/stok/restock/', {
+            'items': [
+                {'product_gudang_id': kp.product_gudang_id, 'quantity': 5}
+                for kp in self.products[:10]
+            ]
+        }, method='post')
+        self.assertEqual([p['stock_gudang'] for p in response.data['products']], [995] * 10)
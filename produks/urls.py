@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GudangProductViewSet, KantinProductViewSet, transfer_stok_kantin, tambah_stok_gudang
+from .views import GudangProductViewSet, KantinProductViewSet, transfer_stok_kantin, restock_kantin, tambah_stok_gudang
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'gudang/produk', GudangProductViewSet)
@@ -9,5 +10,7 @@ router.register(r'kantin/produk', KantinProductViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('kantin/stok/transfer/', transfer_stok_kantin, name='transfer_stok_kantin'),
+    path('kantin/stok/restock/', restock_kantin, name='restock_kantin'),
     path('gudang/stok/masuk/', tambah_stok_gudang, name='tambah_stok_gudang'),
+    path('async/kantin/produk/', async_views.kantin_produk_list, name='async_kantin_produk_list'),
 ]
\ No newline at end of file
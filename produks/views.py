@@ -4,8 +4,10 @@ from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from .models import GudangProduct, KantinProduct
-from .serializers import GudangProductSerializer, KantinProductSerializer, TransferStokSerializer, TambahStokGudangSerializer, TransferResponseSerializer, TambahStokGudangResponseSerializer
+from .replenishment import TransferError, execute, plan
+from .serializers import GudangProductSerializer, KantinProductSerializer, TransferStokSerializer, TransferBatchSerializer, TambahStokGudangSerializer, TransferResponseSerializer, TambahStokGudangResponseSerializer
 
 
 class IsAdmin(BasePermission):
@@ -26,7 +28,7 @@ class GudangProductViewSet(viewsets.ModelViewSet):
 
 
 class KantinProductViewSet(viewsets.ModelViewSet):
-    queryset = KantinProduct.objects.all()
+    queryset = KantinProduct.objects.select_related('product_gudang')
     serializer_class = KantinProductSerializer
 
     def get_permissions(self):
@@ -73,6 +75,40 @@ def transfer_stok_kantin(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdmin])
+def restock_kantin(request):
+    if request.method == 'GET':
+        snapshot, rencana = plan()
+        return Response({
+            'status': True,
+            'dihitung_pada': snapshot.created_at if snapshot else timezone.now(),
+            'rencana': rencana
+        })
+
+    serializer = TransferBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        products = execute(serializer.validated_data['items'])
+    except TransferError as e:
+        return Response({'error': e.message, 'detail': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'message': 'Stok berhasil ditransfer ke kantin',
+        'products': [
+            {
+                'id': kp.product_gudang_id,
+                'name': kp.product_gudang.name,
+                'stock_gudang': kp.product_gudang.stock_gudang,
+                'stock_kantin': kp.stock_kantin
+            }
+            for kp in products
+        ]
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAdmin])
 def tambah_stok_gudang(request):
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import uuid
+from datetime import date, timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+GLOBAL_KEY = 'laporan:gen'
+
+
+def _day_key(day):
+    return f'laporan:gen:hari:{day.isoformat()}'
+
+
+def _month_key(day):
+    return f'laporan:gen:bulan:{day.year}-{day.month:02d}'
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def _bump(keys):
+    # A fresh random token rather than a counter: concurrent bumps cannot
+    # cancel out, and no later value can ever match an old one.
+    cache.set_many({key: _new_generation() for key in keys}, None)
+
+
+def _generations(keys):
+    """
+    Current generation of each key. A key missing from the cache (never
+    bumped, or culled) gets a fresh token, so reports cached under the old
+    one are never matched again.
+    """
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_generation(), None)
+        generations.update(cache.get_many(missing))
+    return generations
+
+
+def invalidate(days):
+    """
+    Drop cached reports covering any of ``days`` once the current transaction
+    commits, so a concurrent reader cannot re-cache the old numbers.
+    """
+    days = set(days)
+    if not days:
+        return
+
+    keys = {_day_key(day) for day in days} | {_month_key(day) for day in days}
+    db_transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_all():
+    db_transaction.on_commit(lambda: _bump([GLOBAL_KEY]))
+
+
+def _generation_keys(start, end):
+    if start == end:
+        return [GLOBAL_KEY, _day_key(start)]
+
+    keys = [GLOBAL_KEY]
+    month = date(start.year, start.month, 1)
+    while month <= end:
+        keys.append(_month_key(month))
+        month = (month + timedelta(days=32)).replace(day=1)
+    return keys
+
+
+def cached_report(report_type, period):
+    """
+    Cache a report view per ``(report_type, query params)`` and period.
+
+    ``period(request)`` returns the ``(start, end)`` business days a request
+    covers, or ``None`` to bypass the cache. The key embeds write generations
+    for those days/months, which the sale and expense write paths bump, so a
+    cached report only changes when data in its period does. Periods that
+    ended before today are kept for ``REPORT_CACHE_CLOSED_TIMEOUT`` (by
+    default until evicted) and the current one expires after
+    ``REPORT_CACHE_TIMEOUT``, as a safety net. Responses
+    carry an ETag and a matching ``If-None-Match`` gets a bodiless 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                bounds = period(request)
+            except ValueError:
+                bounds = None
+            if bounds is None:
+                return view(request, *args, **kwargs)
+
+            start, end = bounds
+            generation_keys = _generation_keys(start, end)
+            generations = _generations(generation_keys)
+            params = json.dumps(sorted(request.query_params.items()))
+            version = ':'.join(str(generations.get(key) or _new_generation()) for key in generation_keys)
+            key = 'laporan:{}:{}'.format(
+                report_type,
+                hashlib.md5(f'{params}|{version}'.encode()).hexdigest()
+            )
+
+            cached = cache.get(key)
+            if cached is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+                body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+                cached = {
+                    'data': json.loads(body),
+                    'etag': '"{}"'.format(hashlib.md5(body.encode()).hexdigest())
+                }
+                closed = end < timezone.localdate()
+                cache.set(
+                    key,
+                    cached,
+                    settings.REPORT_CACHE_CLOSED_TIMEOUT if closed else settings.REPORT_CACHE_TIMEOUT
+                )
+
+            headers = {'ETag': cached['etag'], 'Cache-Control': 'private, no-cache'}
+            if request.headers.get('If-None-Match') == cached['etag']:
+                return Response(status=304, headers=headers)
+            return Response(cached['data'], headers=headers)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,128 @@
+from django.db.models import Sum
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, Side
+from openpyxl.utils import get_column_letter
+
+from produks.models import KantinProduct
+from transactions.models import TransactionItem
+
+
+REKAP_HEADERS = [
+    'No',
+    'Nama Barang',
+    'Stok Masuk',
+    'Stok Awal',
+    'Jumlah Stok',
+    'Satuan',
+    'Terjual',
+    'Sisa Stok',
+    'Harga'
+]
+
+CENTERED_COLUMNS = {1, 3, 4, 5, 7, 8, 9}
+
+PROGRESS_EVERY = 500
+
+
+def _styles():
+    center_align = Alignment(horizontal='center', vertical='center')
+    thin = Side(style='thin')
+    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    judul = NamedStyle(name='rekap_judul')
+    judul.font = Font(bold=True, size=14)
+    judul.alignment = center_align
+
+    header = NamedStyle(name='rekap_header')
+    header.font = Font(bold=True)
+    header.alignment = center_align
+    header.border = thin_border
+
+    teks = NamedStyle(name='rekap_teks')
+    teks.border = thin_border
+
+    angka = NamedStyle(name='rekap_angka')
+    angka.border = thin_border
+    angka.alignment = center_align
+
+    return judul, header, teks, angka
+
+
+def terjual_per_produk(trx_filter):
+    """Sold quantity per kantin product for the period, in one grouped query."""
+    return dict(
+        TransactionItem.objects
+        .filter(product__isnull=False, **trx_filter)
+        .values_list('product_id')
+        .annotate(total=Sum('qty'))
+        .order_by()
+    )
+
+
+def write_rekap_kantin(fileobj, trx_filter, periode, progress=None):
+    """
+    Write the kantin stock recap for ``periode`` into ``fileobj``.
+
+    Uses openpyxl's write-only mode with named styles, so rows are flushed to
+    disk as they are appended and memory does not grow with the SKU count.
+    ``progress(done, total)`` is called as product rows are written.
+    """
+    terjual_map = terjual_per_produk(trx_filter)
+    total = KantinProduct.objects.count() if progress else 0
+
+    wb = Workbook(write_only=True)
+    styles = _styles()
+    for style in styles:
+        wb.add_named_style(style)
+    judul, header, teks, angka = (style.name for style in styles)
+
+    ws = wb.create_sheet('Rekap Stok Kantin')
+    for col in range(1, len(REKAP_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    ws.append([styled(f'REKAP STOK KANTIN ({periode})', judul)])
+    ws.merged_cells.add(f'A1:{get_column_letter(len(REKAP_HEADERS))}1')
+
+    ws.append([styled(title, header) for title in REKAP_HEADERS])
+
+    kantin_products = (
+        KantinProduct.objects
+        .select_related('product_gudang')
+        .order_by('id')
+        .iterator(chunk_size=2000)
+    )
+
+    for no, kp in enumerate(kantin_products, start=1):
+        terjual = terjual_map.get(kp.id, 0)
+
+        stok_awal = kp.stock_kantin + terjual
+        stok_masuk = 0
+        jumlah_stok = stok_awal + stok_masuk
+
+        data = [
+            no,
+            kp.product_gudang.name,
+            stok_masuk,
+            stok_awal,
+            jumlah_stok,
+            kp.product_gudang.satuan,
+            terjual,
+            kp.stock_kantin,
+            kp.product_gudang.price
+        ]
+
+        ws.append([
+            styled(value, angka if col in CENTERED_COLUMNS else teks)
+            for col, value in enumerate(data, start=1)
+        ])
+
+        if progress and no % PROGRESS_EVERY == 0:
+            progress(no, total)
+
+    wb.save(fileobj)
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import tempfile
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from produks.models import GudangProduct, KantinProduct
+from transactions.exports import iter_item_rows, stream_csv_gzip, stream_ndjson
+from transactions.models import Transaction, TransactionItem
+from .excel import write_rekap_kantin
+from .models import ExportJob
+from .periode import parse_tanggal, periode_rekap
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+
+def _rekap_params(params):
+    awal, akhir, label = periode_rekap(params)
+    return {'start': awal.isoformat(), 'end': akhir.isoformat(), 'periode': str(label)}
+
+
+def _run_rekap(params, fileobj, progress):
+    trx_filter = {
+        'transaction__business_date__gte': params['start'],
+        'transaction__business_date__lt': params['end'],
+    }
+    write_rekap_kantin(fileobj, trx_filter, params['periode'], progress)
+    return f"rekap_kantin_{params['periode']}.xlsx"
+
+
+def _riwayat_params(params):
+    export_format = params.get('format', 'csv')
+    if export_format not in ('ndjson', 'csv'):
+        raise ValueError('format must be ndjson or csv')
+
+    start = parse_tanggal(params['start']) if params.get('start') else None
+    end = parse_tanggal(params['end']) if params.get('end') else timezone.localdate()
+
+    return {
+        'format': export_format,
+        'start': start.isoformat() if start else None,
+        'end': (end + timedelta(days=1)).isoformat(),
+    }
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(parse_tanggal(day), time.min))
+
+
+def _run_riwayat(params, fileobj, progress):
+    start = _local_midnight(params['start']) if params['start'] else None
+    end = _local_midnight(params['end'])
+
+    items = TransactionItem.objects.filter(transaction__created_at__lt=end)
+    if start:
+        items = items.filter(transaction__created_at__gte=start)
+    total = items.count()
+
+    def counted(rows):
+        for done, row in enumerate(rows, start=1):
+            yield row
+            if done % 2000 == 0:
+                progress(done, total)
+
+    rows = counted(iter_item_rows(start, end))
+    if params['format'] == 'csv':
+        chunks, extension = stream_csv_gzip(rows), 'csv.gz'
+    else:
+        chunks, extension = (line.encode() for line in stream_ndjson(rows)), 'ndjson'
+
+    for chunk in chunks:
+        fileobj.write(chunk)
+
+    return f"riwayat_{params['start'] or 'awal'}_{params['end']}.{extension}"
+
+
+def _period_signature(params):
+    """Count and last id of the sales in the export period, so a backfilled sale invalidates reuse."""
+    transactions = Transaction.objects.filter(business_date__lt=params['end'])
+    if params.get('start'):
+        transactions = transactions.filter(business_date__gte=params['start'])
+    return transactions.aggregate(jumlah=Count('id'), terakhir=Max('id'))
+
+
+def _rekap_signature(params):
+    """The rekap also prints current stock, names and prices, so any product change invalidates reuse."""
+    return {
+        **_period_signature(params),
+        'kantin': KantinProduct.objects.aggregate(
+            jumlah=Count('id'),
+            stok=Sum('stock_kantin'),
+            diubah=Max('updated_at')
+        ),
+        'gudang': GudangProduct.objects.aggregate(diubah=Max('updated_at')),
+    }
+
+
+# kind -> (normalise request params, write the export and return its file name,
+#          fingerprint of the data a finished export of a closed period depends on)
+EXPORTS = {
+    'rekap_kantin': (_rekap_params, _run_rekap, _rekap_signature),
+    'riwayat': (_riwayat_params, _run_riwayat, _period_signature),
+}
+
+
+def submit(user, kind, data):
+    """
+    Queue an export of ``kind`` for ``data`` and return ``(job, reused)``.
+
+    An identical request that is still queued or running is returned instead
+    of a new job. For periods that ended before today, a finished export is
+    reused as long as nothing it shows has changed since. Raises
+    ValueError for an unknown kind or invalid parameters.
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f'Unknown export type: {kind}')
+
+    normalise, _, signature = EXPORTS[kind]
+    params = normalise(data)
+    closed = params['end'] <= timezone.localdate().isoformat()
+
+    fingerprint = {'kind': kind, 'params': params}
+    if closed:
+        fingerprint['data'] = signature(params)
+    request_hash = hashlib.sha256(
+        json.dumps(fingerprint, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+    statuses = [ExportJob.PENDING, ExportJob.RUNNING]
+    if closed:
+        statuses.append(ExportJob.DONE)
+
+    for job in (
+        ExportJob.objects
+        .filter(kind=kind, request_hash=request_hash, status__in=statuses)
+        .order_by('-created_at')
+    ):
+        if job.status != ExportJob.DONE or job.file.storage.exists(job.file.name):
+            return job, True
+
+    job = ExportJob.objects.create(
+        kind=kind,
+        params=params,
+        request_hash=request_hash,
+        requested_by=user
+    )
+    return job, False
+
+
+def requeue_stale():
+    """Put jobs whose worker died back in the queue, or fail them after ``MAX_ATTEMPTS``."""
+    cutoff = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+    stale = ExportJob.objects.filter(status=ExportJob.RUNNING, started_at__lt=cutoff)
+
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ExportJob.FAILED,
+        error='Worker berhenti sebelum export selesai',
+        finished_at=timezone.now()
+    )
+    return stale.update(status=ExportJob.PENDING, started_at=None) + failed
+
+
+def claim_next():
+    """
+    Atomically take the oldest pending job, or return None. The status check
+    in the UPDATE makes this safe across threads and worker processes.
+    """
+    candidates = (
+        ExportJob.objects
+        .filter(status=ExportJob.PENDING)
+        .order_by('created_at', 'id')
+        .values_list('id', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = ExportJob.objects.filter(pk=pk, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING,
+            started_at=timezone.now(),
+            progress=0,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def _reporter(job):
+    last = [0]
+
+    def progress(done, total):
+        percent = min(99, done * 100 // total) if total else 0
+        if percent > last[0]:
+            last[0] = percent
+            ExportJob.objects.filter(pk=job.pk).update(progress=percent)
+
+    return progress
+
+
+def run(job):
+    """Generate the file for a claimed job and store it under ``MEDIA_ROOT``."""
+    _, write, _ = EXPORTS[job.kind]
+
+    try:
+        with tempfile.TemporaryFile() as fileobj:
+            filename = write(job.params, fileobj, _reporter(job))
+            fileobj.seek(0)
+            stem, _, extension = filename.partition('.')
+            job.file.save(
+                f'{stem}_{uuid.uuid4().hex[:12]}.{extension}',
+                File(fileobj),
+                save=False
+            )
+        job.status = ExportJob.DONE
+        job.progress = 100
+        job.error = ''
+    except Exception as e:
+        logger.exception('Export job %s failed', job.pk)
+        job.status = ExportJob.FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'file', 'error', 'finished_at'])
+    return job
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.periode import parse_tanggal
+from reports.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales and expense rollup tables from raw transactions and expenses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First business day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--end', help='Last business day to rebuild (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_tanggal(options['start']) if options['start'] else None
+            end = parse_tanggal(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        counts = rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            'Rollups rebuilt: {produk} product-day, {kasir} kasir-day, {pengeluaran} expense-day rows'.format(**counts)
+        ))
@@ -0,0 +1,59 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reports.jobs import claim_next, requeue_stale, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a pool of export workers that generate queued ExportJob files into '
+        'MEDIA_ROOT. Jobs are claimed atomically, so several instances of this '
+        'command may run side by side.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.EXPORT_WORKERS)
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f'{requeued} stale job(s) requeued')
+
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=self._work, args=(stop, options), daemon=True)
+            for _ in range(max(1, options['workers']))
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            self.stdout.write('Stopping after the running jobs finish...')
+            for worker in workers:
+                worker.join()
+
+    def _work(self, stop, options):
+        try:
+            while not stop.is_set():
+                job = claim_next()
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll'])
+                    requeue_stale()
+                    continue
+
+                job = run(job)
+                self.stdout.write(f'Export job {job.pk} ({job.kind}): {job.status}')
+        finally:
+            connection.close()
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 12:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('produks', '0005_delete_product_kantinproduct_product_gudang'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyExpense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField(unique=True)),
+                ('total_pengeluaran', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('jumlah_catatan', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('product_name', models.CharField(max_length=255)),
+                ('product_category', models.CharField(blank=True, max_length=100)),
+                ('qty', models.PositiveIntegerField(default=0)),
+                ('pendapatan', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='produks.kantinproduct')),
+            ],
+            options={
+                'unique_together': {('tanggal', 'product')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyKasirSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('total_transaksi', models.PositiveIntegerField(default=0)),
+                ('total_penjualan', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('tanggal', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    TransactionItem = apps.get_model('transactions', 'TransactionItem')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Expense = apps.get_model('expenses', 'Expense')
+    DailyProductSales = apps.get_model('reports', 'DailyProductSales')
+    DailyKasirSales = apps.get_model('reports', 'DailyKasirSales')
+    DailyExpense = apps.get_model('reports', 'DailyExpense')
+
+    DailyProductSales.objects.bulk_create([
+        DailyProductSales(
+            tanggal=row['day'],
+            product_id=row['product_id'],
+            product_name=row['name'],
+            product_category=row['category'],
+            qty=row['qty'],
+            pendapatan=row['pendapatan'],
+        )
+        for row in TransactionItem.objects
+        .annotate(day=TruncDate('transaction__created_at'))
+        .values('day', 'product_id')
+        .annotate(
+            name=Max('product_name'),
+            category=Max('product_category'),
+            qty=Sum('qty'),
+            pendapatan=Sum('subtotal'),
+        )
+        .order_by()
+    ], batch_size=500)
+
+    DailyKasirSales.objects.bulk_create([
+        DailyKasirSales(
+            tanggal=row['day'],
+            user_id=row['user_id'],
+            total_transaksi=row['count'],
+            total_penjualan=row['total'],
+        )
+        for row in Transaction.objects
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'user_id')
+        .annotate(count=Count('id'), total=Sum('total'))
+        .order_by()
+    ], batch_size=500)
+
+    DailyExpense.objects.bulk_create([
+        DailyExpense(
+            tanggal=row['tanggal'],
+            total_pengeluaran=row['total'],
+            jumlah_catatan=row['count'],
+        )
+        for row in Expense.objects
+        .values('tanggal')
+        .annotate(total=Sum('jumlah'), count=Count('id'))
+        .order_by()
+    ], batch_size=500)
+
+
+def clear_rollups(apps, schema_editor):
+    for name in ('DailyProductSales', 'DailyKasirSales', 'DailyExpense'):
+        apps.get_model('reports', name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_daily_rollups'),
+        ('transactions', '0008_transactionitem_product_snapshot'),
+        ('expenses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, clear_rollups),
+    ]
@@ -1,3 +1,126 @@
 from django.db import models
+from django.conf import settings
+from produks.models import KantinProduct
 
-# Create your models here.
+
+class DailyProductSales(models.Model):
+    tanggal = models.DateField()
+
+    product = models.ForeignKey(
+        KantinProduct,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+
+    product_name = models.CharField(max_length=255)
+
+    product_category = models.CharField(max_length=100, blank=True)
+
+    qty = models.PositiveIntegerField(default=0)
+
+    pendapatan = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    class Meta:
+        unique_together = ('tanggal', 'product')
+
+    def __str__(self):
+        return f"{self.tanggal} {self.product_name}: {self.qty}"
+
+
+class DailyKasirSales(models.Model):
+    tanggal = models.DateField()
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+
+    total_transaksi = models.PositiveIntegerField(default=0)
+
+    total_penjualan = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    class Meta:
+        unique_together = ('tanggal', 'user')
+
+    def __str__(self):
+        return f"{self.tanggal} {self.user}: {self.total_penjualan}"
+
+
+class DailyExpense(models.Model):
+    tanggal = models.DateField(unique=True)
+
+    total_pengeluaran = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    jumlah_catatan = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.tanggal}: {self.total_pengeluaran}"
+
+
+class ExportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    KIND_CHOICES = (
+        ('rekap_kantin', 'Rekap Stok Kantin'),
+        ('riwayat', 'Riwayat Transaksi'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+
+    params = models.JSONField(default=dict)
+
+    request_hash = models.CharField(max_length=64, db_index=True)
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True
+    )
+
+    progress = models.PositiveSmallIntegerField(default=0)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    file = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+
+    error = models.TextField(blank=True)
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
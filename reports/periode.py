@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def rentang_bulan(month, year, bulan=1):
+    """``[awal, akhir)`` covering ``bulan`` months from ``month``/``year``, for range filters on dates."""
+    awal = date(year, month, 1)
+    month_index = year * 12 + month - 1 + bulan
+    return awal, date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def parse_tanggal(value):
+    """``YYYY-MM-DD`` to a date; raises ValueError for anything else, including non-strings from JSON."""
+    day = parse_date(value) if isinstance(value, str) else None
+    if day is None:
+        raise ValueError(f'Invalid date: {value}')
+    return day
+
+
+def _angka(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise ValueError(f'Invalid number: {value}')
+    return int(value)
+
+
+def periode_rekap(params):
+    """
+    Resolve the ``date`` / ``month`` + ``year`` / ``year`` parameters of the
+    rekap exports into ``(awal, akhir, label)`` with ``[awal, akhir)`` as
+    business dates; today when none is given. Raises ValueError when invalid.
+    """
+    tanggal = params.get('date')
+    month = params.get('month')
+    year = params.get('year')
+
+    if tanggal:
+        awal = parse_tanggal(tanggal)
+        return awal, awal + timedelta(days=1), tanggal
+    if month and year:
+        return (*rentang_bulan(_angka(month), _angka(year)), f"{month}-{year}")
+    if year:
+        return (*rentang_bulan(1, _angka(year), bulan=12), year)
+
+    today = timezone.localdate()
+    return today, today + timedelta(days=1), today.strftime('%Y-%m-%d')
@@ -0,0 +1,204 @@
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Case, Count, DecimalField, F, Max, PositiveIntegerField, Q, Sum, Value, When
+
+from expenses.models import Expense
+from transactions.models import Transaction, TransactionItem
+from .cache import invalidate, invalidate_all
+from .models import DailyExpense, DailyKasirSales, DailyProductSales
+
+
+def _accumulate(model, key_fields, rows, counters):
+    """
+    Add ``rows`` (``{key tuple: {field: value}}``) onto the rollup ``model``
+    in a constant number of queries: one SELECT for the keys that already
+    exist, one CASE update for those and one bulk insert for the rest.
+    """
+    if not rows:
+        return
+
+    def match(key):
+        return Q(**dict(zip(key_fields, key)))
+
+    for attempt in range(2):
+        try:
+            with db_transaction.atomic():
+                keys = Q()
+                for key in rows:
+                    keys |= match(key)
+
+                existing = set(model.objects.filter(keys).values_list(*key_fields))
+
+                if existing:
+                    changes = {}
+                    for field, output_field in counters.items():
+                        changes[field] = Case(
+                            *[When(match(key), then=F(field) + rows[key][field]) for key in existing],
+                            default=F(field),
+                            output_field=output_field
+                        )
+                    for field in rows[next(iter(existing))]:
+                        if field not in counters:
+                            changes[field] = Case(
+                                *[When(match(key), then=Value(rows[key][field])) for key in existing],
+                                default=F(field)
+                            )
+
+                    existing_keys = Q()
+                    for key in existing:
+                        existing_keys |= match(key)
+                    model.objects.filter(existing_keys).update(**changes)
+
+                model.objects.bulk_create([
+                    model(**dict(zip(key_fields, key)), **values)
+                    for key, values in rows.items()
+                    if key not in existing
+                ])
+            return
+        except IntegrityError:
+            # Another writer created one of the missing rows first; retry
+            # so it is picked up by the update branch.
+            if attempt:
+                raise
+
+
+def record_sales(transactions, items):
+    """Fold freshly written sales and their line items into the daily rollups."""
+    days = {trx.pk: trx.business_date for trx in transactions}
+
+    product_rows = {}
+    for item in items:
+        key = (days[item.transaction_id], item.product_id)
+        row = product_rows.setdefault(key, {
+            'qty': 0,
+            'pendapatan': 0,
+            'product_name': item.product_name,
+            'product_category': item.product_category,
+        })
+        row['qty'] += item.qty
+        row['pendapatan'] += item.subtotal
+
+    kasir_rows = {}
+    for trx in transactions:
+        key = (days[trx.pk], trx.user_id)
+        row = kasir_rows.setdefault(key, {'total_transaksi': 0, 'total_penjualan': 0})
+        row['total_transaksi'] += 1
+        row['total_penjualan'] += trx.total
+
+    _accumulate(
+        DailyProductSales,
+        ('tanggal', 'product_id'),
+        product_rows,
+        {
+            'qty': PositiveIntegerField(),
+            'pendapatan': DecimalField(max_digits=14, decimal_places=2),
+        }
+    )
+    _accumulate(
+        DailyKasirSales,
+        ('tanggal', 'user_id'),
+        kasir_rows,
+        {
+            'total_transaksi': PositiveIntegerField(),
+            'total_penjualan': DecimalField(max_digits=14, decimal_places=2),
+        }
+    )
+    invalidate(days.values())
+
+
+def record_expense(expense):
+    _accumulate(
+        DailyExpense,
+        ('tanggal',),
+        {(expense.tanggal,): {'total_pengeluaran': expense.jumlah, 'jumlah_catatan': 1}},
+        {
+            'total_pengeluaran': DecimalField(max_digits=14, decimal_places=2),
+            'jumlah_catatan': PositiveIntegerField(),
+        }
+    )
+    invalidate([expense.tanggal])
+
+
+@db_transaction.atomic
+def rebuild(start=None, end=None):
+    """
+    Recompute every rollup row for business days ``start``..``end`` (both
+    inclusive, open-ended when ``None``) from the raw tables with one grouped
+    query per rollup. Returns the number of rows written per table.
+    """
+    days = {}
+    items = TransactionItem.objects.all()
+    transactions = Transaction.objects.all()
+    if start:
+        days['tanggal__gte'] = start
+        items = items.filter(transaction__business_date__gte=start)
+        transactions = transactions.filter(business_date__gte=start)
+    if end:
+        days['tanggal__lte'] = end
+        items = items.filter(transaction__business_date__lte=end)
+        transactions = transactions.filter(business_date__lte=end)
+
+    DailyProductSales.objects.filter(**days).delete()
+    DailyKasirSales.objects.filter(**days).delete()
+    DailyExpense.objects.filter(**days).delete()
+
+    product_rows = DailyProductSales.objects.bulk_create(
+        [
+            DailyProductSales(
+                tanggal=row['transaction__business_date'],
+                product_id=row['product_id'],
+                product_name=row['name'],
+                product_category=row['category'],
+                qty=row['qty'],
+                pendapatan=row['pendapatan'],
+            )
+            for row in items
+            .values('transaction__business_date', 'product_id')
+            .annotate(
+                name=Max('product_name'),
+                category=Max('product_category'),
+                qty=Sum('qty'),
+                pendapatan=Sum('subtotal'),
+            )
+            .order_by()
+        ],
+        batch_size=500
+    )
+
+    kasir_rows = DailyKasirSales.objects.bulk_create(
+        [
+            DailyKasirSales(
+                tanggal=row['business_date'],
+                user_id=row['user_id'],
+                total_transaksi=row['count'],
+                total_penjualan=row['total'],
+            )
+            for row in transactions
+            .values('business_date', 'user_id')
+            .annotate(count=Count('id'), total=Sum('total'))
+            .order_by()
+        ],
+        batch_size=500
+    )
+
+    expense_rows = DailyExpense.objects.bulk_create(
+        [
+            DailyExpense(
+                tanggal=row['tanggal'],
+                total_pengeluaran=row['total'],
+                jumlah_catatan=row['count'],
+            )
+            for row in Expense.objects.filter(**days)
+            .values('tanggal')
+            .annotate(total=Sum('jumlah'), count=Count('id'))
+            .order_by()
+        ],
+        batch_size=500
+    )
+
+    invalidate_all()
+
+    return {
+        'produk': len(product_rows),
+        'kasir': len(kasir_rows),
+        'pengeluaran': len(expense_rows),
+    }
@@ -1,3 +1,669 @@
-from django.test import TestCase
+import io
+import json
+import re
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from expenses.models import Expense
+from produks.models import GudangProduct, KantinProduct
+from reports.excel import REKAP_HEADERS
+from reports.jobs import MAX_ATTEMPTS, claim_next, requeue_stale, run
+from reports.models import DailyExpense, DailyKasirSales, DailyProductSales, ExportJob
+from reports.rollups import rebuild, record_expense
+from transactions.models import Transaction, TransactionItem
+from transactions.services import sync_sales
+from users.models import User
+
+
+# Tables that grow with sales volume; reading any of them must go through an index.
+HOT_TABLES = {
+    'transactions_transaction',
+    'transactions_transactionitem',
+    'transactions_idempotencykey',
+    'expenses_expense',
+    'reports_dailyproductsales',
+    'reports_dailykasirsales',
+    'reports_dailyexpense',
+    'ai_insight_productforecast',
+    'ai_insight_basketpaircount',
+    'ai_insight_anomalyalert',
+}
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, allow=()):
+    """
+    Steps of ``plan`` that read a hot table without an index (``SCAN t``),
+    or that sort a non-aggregated result in a temp B-tree instead of walking
+    an index in order.
+    """
+    problems = []
+    grouped = any('GROUP BY' in step for step in plan)
+
+    for step in plan:
+        words = step.split()
+        # Subqueries show up under their alias (U0, U1, ...), always a hot table here.
+        hot = words[1:2] and (words[1] in HOT_TABLES or re.fullmatch(r'U\d+', words[1]))
+        if words[0] == 'SCAN' and len(words) == 2 and hot and words[1] not in allow:
+            problems.append(step)
+        if step == 'USE TEMP B-TREE FOR ORDER BY' and not grouped:
+            problems.append(step)
+
+    touches_hot = any(table in step for step in plan for table in HOT_TABLES - set(allow))
+    return problems if touches_hot else []
+
+
+class ApiTestCase(TestCase):
+    """Users and helpers shared by the behaviour and query plan tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'Admin', 'pw123456', role='admin')
+        cls.kasir = User.objects.create_user('kasir', 'Kasir', 'pw123456', role='kasir')
+        cls.kasir2 = User.objects.create_user('kasir2', 'Kasir 2', 'pw123456', role='kasir')
+
+    @staticmethod
+    def make_product(name, price=1000, stock_kantin=10, stock_gudang=100, category='Makanan'):
+        return KantinProduct.objects.create(
+            product_gudang=GudangProduct.objects.create(
+                name=name,
+                category=category,
+                price=price,
+                stock_gudang=stock_gudang
+            ),
+            stock_kantin=stock_kantin
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user, method, url, data=None, **extra):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = getattr(client, method)(url, data, format='json' if method == 'post' else None, **extra)
+        if response.streaming:
+            response.streamed_content = b''.join(response.streaming_content)
+        return response
+
+    def pay(self, user, items, uang_bayar, **extra):
+        return self.request(user, 'post', '/api/payment/', {
+            'items': [{'product_id': product.id, 'qty': qty} for product, qty in items],
+            'uang_bayar': uang_bayar
+        }, **extra)
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class ReportDataTestCase(ApiTestCase):
+    """
+    A handful of sales and expenses at fixed local times, one of them just
+    after midnight (the previous day in UTC), for checking report figures.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.roti = cls.make_product('Roti', price=5000, stock_kantin=100, category='Makanan')
+        cls.teh = cls.make_product('Es Teh', price=3000, stock_kantin=100, category='Minuman')
+
+        cls.sell(cls.kasir, local(2024, 3, 4, 10, 30), 20000, (cls.roti, 2), (cls.teh, 1))
+        cls.sell(cls.kasir, local(2024, 3, 4, 23, 30), 5000, (cls.roti, 1))
+        cls.sell(cls.kasir2, local(2024, 3, 5, 0, 30), 6000, (cls.teh, 2), payment_method='card')
+        cls.sell(cls.kasir2, local(2024, 3, 12, 14, 0), 20000, (cls.roti, 3))
+        cls.sell(cls.kasir, local(2024, 4, 2, 9, 0), 15000, (cls.teh, 5))
+
+        cls.spend(cls.kasir, local(2024, 3, 4, 12, 0), 4000)
+        cls.spend(cls.kasir2, local(2024, 3, 12, 15, 0), 1000)
+        cls.spend(cls.kasir, local(2024, 4, 2, 8, 0), 2500)
+
+    @classmethod
+    def sell(cls, user, when, uang_bayar, *items, payment_method='cash'):
+        result = sync_sales(user, [{
+            'created_at': when.isoformat(),
+            'uang_bayar': uang_bayar,
+            'payment_method': payment_method,
+            'items': [{'product_id': product.id, 'qty': qty} for product, qty in items],
+        }])
+        assert result[0]['status'], result
+        return result[0]
+
+    @classmethod
+    def spend(cls, user, when, jumlah):
+        expense = Expense.objects.create(user=user, deskripsi='Belanja', jumlah=jumlah)
+        Expense.objects.filter(pk=expense.pk).update(tanggal=timezone.localdate(when), created_at=when)
+        expense.refresh_from_db()
+        record_expense(expense)
+        return expense
+
+
+class RollupTests(ReportDataTestCase):
+    def rollups(self):
+        return (
+            sorted(DailyProductSales.objects.values_list('tanggal', 'product_id', 'product_name', 'qty', 'pendapatan')),
+            sorted(DailyKasirSales.objects.values_list('tanggal', 'user_id', 'total_transaksi', 'total_penjualan')),
+            sorted(DailyExpense.objects.values_list('tanggal', 'total_pengeluaran', 'jumlah_catatan')),
+        )
+
+    def test_rollups_match_raw_aggregates(self):
+        produk, kasir, pengeluaran = self.rollups()
+
+        self.assertEqual(produk, sorted(
+            TransactionItem.objects
+            .values_list('transaction__business_date', 'product_id', 'product_name')
+            .annotate(qty=Sum('qty'), pendapatan=Sum('subtotal'))
+            .order_by()
+        ))
+        self.assertEqual(kasir, sorted(
+            Transaction.objects
+            .values_list('business_date', 'user_id')
+            .annotate(jumlah=Count('id'), total=Sum('total'))
+            .order_by()
+        ))
+        self.assertEqual(pengeluaran, sorted(
+            Expense.objects
+            .values_list('tanggal')
+            .annotate(total=Sum('jumlah'), jumlah=Count('id'))
+            .order_by()
+        ))
+        self.assertIn((date(2024, 3, 5), self.kasir2.id, 1, 6000), kasir)
+
+    def test_rebuild_reproduces_incremental_rollups(self):
+        before = self.rollups()
+        DailyKasirSales.objects.update(total_penjualan=0)
+
+        rebuild()
+
+        self.assertEqual(self.rollups(), before)
+
+    def test_rebuild_command_rejects_bad_dates(self):
+        before = self.rollups()
+        DailyKasirSales.objects.update(total_penjualan=0)
+
+        for option in ({'start': 'abc'}, {'end': '2024-02-30'}):
+            with self.assertRaises(CommandError):
+                call_command('rebuild_rollups', **option)
+        self.assertFalse(DailyKasirSales.objects.exclude(total_penjualan=0).exists())
+
+        call_command('rebuild_rollups', start='2024-03-01', end='2024-04-30', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), before)
+
+    def test_laporan_harian_reads_rollups(self):
+        data = self.request(self.admin, 'get', '/api/laporan/harian/', {'date': '2024-03-04'}).data
+
+        self.assertEqual(data['penjualan']['total_transaksi'], 2)
+        self.assertEqual(data['penjualan']['total_penjualan'], 18000)
+        self.assertEqual(data['pengeluaran']['total_pengeluaran'], 4000)
+        self.assertEqual(data['ringkasan']['laba_bersih'], 14000)
+        self.assertEqual(len(data['penjualan']['detail']), 2)
+
+
+class PeriodReportTests(ReportDataTestCase):
+    def test_laporan_tahunan(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.request(self.admin, 'get', '/api/laporan/tahunan/', {'year': 2024}).data
+
+        grafik = {g['bulan']: (g['penjualan'], g['pengeluaran']) for g in data['grafik']}
+        self.assertEqual(len(grafik), 12)
+        self.assertEqual(grafik['03'], (39000, 5000))
+        self.assertEqual(grafik['04'], (15000, 2500))
+        self.assertEqual(grafik['05'], (0, 0))
+        self.assertEqual(data['penjualan']['total_penjualan'], 54000)
+        self.assertEqual(data['ringkasan']['laba_bersih'], 46500)
+        # Auth lookups aside, one grouped query per rollup.
+        self.assertEqual(sum('reports_daily' in q['sql'] for q in queries.captured_queries), 2)
+
+    def test_laporan_multi_tahunan(self):
+        data = self.request(self.admin, 'get', '/api/laporan/multi-tahunan/', {'start_year': 2023, 'end_year': 2024}).data
+
+        self.assertEqual(
+            [(t['tahun'], t['penjualan'], t['pengeluaran']) for t in data['tahunan']],
+            [(2023, 0, 0), (2024, 54000, 7500)]
+        )
+        self.assertEqual(
+            self.request(self.admin, 'get', '/api/laporan/multi-tahunan/', {'start_year': 2024, 'end_year': 2023}).status_code,
+            400
+        )
+
+    def test_laporan_bulanan(self):
+        data = self.request(self.admin, 'get', '/api/laporan/bulanan/', {'month': 3, 'year': 2024}).data
+
+        self.assertEqual(data['penjualan'], {'total_penjualan': 39000, 'total_transaksi': 4})
+        self.assertEqual(data['ringkasan']['laba_bersih'], 34000)
+
+
+class RangeReportTests(ReportDataTestCase):
+    def laporan(self, **params):
+        return self.request(self.admin, 'get', '/api/laporan/range/', params)
+
+    def test_day_buckets(self):
+        data = self.laporan(start='2024-03-04', end='2024-03-06').data
+
+        self.assertEqual(
+            [(b['mulai'], b['total_transaksi'], b['penjualan'], b['pengeluaran']) for b in data['buckets']],
+            [('2024-03-04', 2, 18000, 4000), ('2024-03-05', 1, 6000, 0), ('2024-03-06', 0, 0, 0)]
+        )
+        self.assertEqual(data['ringkasan']['total_penjualan'], 24000)
+
+    def test_week_buckets_are_clipped_to_the_range(self):
+        data = self.laporan(start='2024-03-01', end='2024-03-17', granularity='week', detail='1').data
+
+        self.assertEqual(
+            [(b['mulai'], b['selesai'], b['penjualan'], b['laba_bersih']) for b in data['buckets']],
+            [
+                ('2024-03-01', '2024-03-03', 0, 0),
+                ('2024-03-04', '2024-03-10', 24000, 20000),
+                ('2024-03-11', '2024-03-17', 15000, 14000),
+            ]
+        )
+        self.assertEqual(
+            [(p['produk'], p['qty'], p['pendapatan']) for p in data['buckets'][1]['produk']],
+            [('Roti', 3, 15000), ('Es Teh', 3, 9000)]
+        )
+
+    def test_month_buckets_match_monthly_report(self):
+        data = self.laporan(start='2024-03-01', end='2024-04-30', granularity='month').data
+
+        self.assertEqual(
+            [(b['penjualan'], b['pengeluaran']) for b in data['buckets']],
+            [(39000, 5000), (15000, 2500)]
+        )
+        self.assertEqual(data['ringkasan']['total_transaksi'], 5)
+
+    def test_invalid_period(self):
+        for params in (
+            {'start': '2024-02-30', 'end': '2024-03-05'},
+            {'start': '2024-03-05', 'end': '2024-03-04'},
+            {'start': '2024-03-04'},
+            {'start': '2024-03-04', 'end': '2024-03-05', 'granularity': 'hour'},
+        ):
+            response = self.laporan(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+
+class ShiftReportTests(ReportDataTestCase):
+    def laporan(self, **params):
+        return self.request(self.admin, 'get', '/api/laporan/shift/', params)
+
+    def test_drawer_balance(self):
+        data = self.laporan(start='2024-03-04', kasir=self.kasir.id, modal_awal='50000').data
+
+        [kasir] = data['kasir']
+        self.assertEqual(kasir['total_transaksi'], 2)
+        self.assertEqual(kasir['penjualan_kotor'], 18000)
+        self.assertEqual(kasir['uang_diterima'], 25000)
+        self.assertEqual(kasir['kembalian'], 7000)
+        self.assertEqual(kasir['pengeluaran'], 4000)
+        self.assertEqual(kasir['saldo_laci'], 64000)
+
+    def test_non_cash_sales_stay_out_of_the_drawer(self):
+        data = self.laporan(start='2024-03-05').data
+
+        [kasir] = data['kasir']
+        self.assertEqual(kasir['kasir'], self.kasir2.username)
+        self.assertEqual(kasir['per_metode'], {'cash': 0, 'card': 6000, 'digital': 0})
+        self.assertEqual(kasir['uang_diterima'], 0)
+        self.assertEqual(kasir['saldo_laci'], 0)
+
+    def test_start_datetime_runs_to_end_of_business_day(self):
+        response = self.laporan(start='2024-03-04T12:30:00')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['end'], local(2024, 3, 5))
+        [kasir] = response.data['kasir']
+        self.assertEqual((kasir['total_transaksi'], kasir['penjualan_kotor'], kasir['pengeluaran']), (1, 5000, 0))
+
+    def test_invalid_window(self):
+        for params in (
+            {'start': '2024-03-05', 'end': '2024-03-04'},
+            {'start': '2024-02-30'},
+            {'modal_awal': 'x'},
+            {'modal_awal': 'NaN'},
+            {'modal_awal': 'sNaN'},
+            {'modal_awal': 'Infinity'},
+            {'modal_awal': '-Infinity'},
+        ):
+            self.assertEqual(self.laporan(**{'start': '2024-03-04', **params}).status_code, 400, params)
+
+
+class HeatmapReportTests(ReportDataTestCase):
+    def laporan(self, **params):
+        return self.request(self.admin, 'get', '/api/laporan/heatmap/', params)
+
+    def test_cells_use_local_weekday_and_hour(self):
+        data = self.laporan(start='2024-03-04', end='2024-03-12').data
+
+        cells = {
+            (hari['hari'], jam['jam']): (jam['total_transaksi'], jam['pendapatan'])
+            for hari in data['heatmap']
+            for jam in hari['jam']
+            if jam['total_transaksi']
+        }
+        self.assertEqual(cells, {
+            ('Senin', 10): (1, 13000),
+            ('Senin', 23): (1, 5000),
+            ('Selasa', 0): (1, 6000),
+            ('Selasa', 14): (1, 15000),
+        })
+        self.assertEqual([len(hari['jam']) for hari in data['heatmap']], [24] * 7)
+
+    def test_category_rows(self):
+        data = self.laporan(start='2024-03-04', end='2024-03-12').data
+
+        self.assertEqual(
+            [(k['kategori'], k['hari'], k['jam'], k['total_transaksi'], k['qty'], k['pendapatan']) for k in data['kategori']],
+            [
+                ('Makanan', 'Senin', 10, 1, 2, 10000),
+                ('Makanan', 'Senin', 23, 1, 1, 5000),
+                ('Makanan', 'Selasa', 14, 1, 3, 15000),
+                ('Minuman', 'Senin', 10, 1, 1, 3000),
+                ('Minuman', 'Selasa', 0, 1, 2, 6000),
+            ]
+        )
+
+    def test_invalid_period(self):
+        for params in ({'start': '2024-02-30', 'end': '2024-03-05'}, {'start': '2024-03-05', 'end': '2024-03-04'}):
+            response = self.laporan(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+
+class RekapKantinExcelTests(ReportDataTestCase):
+    def rekap(self, **params):
+        response = self.request(self.admin, 'get', '/api/kantin/rekap/export-excel/', params)
+        self.assertEqual(response.status_code, 200)
+        return list(load_workbook(io.BytesIO(response.streamed_content)).active.iter_rows(values_only=True))
+
+    def test_rekap_bulanan(self):
+        rows = self.rekap(month=3, year=2024)
+
+        self.assertEqual(rows[0][0], 'REKAP STOK KANTIN (3-2024)')
+        self.assertEqual(list(rows[1]), REKAP_HEADERS)
+        # No, nama, masuk, awal, jumlah, satuan, terjual, sisa, harga
+        self.assertEqual([row[:8] for row in rows[2:]], [
+            (1, 'Roti', 0, 100, 100, 'pcs', 6, 94),
+            (2, 'Es Teh', 0, 95, 95, 'pcs', 3, 92),
+        ])
+
+    def test_rekap_harian_uses_local_business_date(self):
+        rows = self.rekap(date='2024-03-05')
+        self.assertEqual([row[6] for row in rows[2:]], [0, 2])
+
+    def test_rekap_invalid_period(self):
+        response = self.request(self.admin, 'get', '/api/kantin/rekap/export-excel/', {'date': '2024-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportCacheTests(ReportDataTestCase):
+    def harian(self, **extra):
+        return self.request(self.admin, 'get', '/api/laporan/harian/', {'date': '2024-03-04'}, **extra)
+
+    def test_hit_needs_no_queries_and_honours_etag(self):
+        first = self.harian()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.harian()
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.harian(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.harian(HTTP_IF_NONE_MATCH='"lama"').status_code, 200)
+
+    def test_closed_periods_do_not_expire(self):
+        with mock.patch('reports.cache.cache.set', wraps=cache.set) as cache_set:
+            self.harian()
+            self.request(self.admin, 'get', '/api/laporan/harian/', {'date': timezone.localdate().isoformat()})
+
+        self.assertEqual(
+            [call.args[2] for call in cache_set.call_args_list],
+            [None, settings.REPORT_CACHE_TIMEOUT]
+        )
+
+    def test_sale_invalidates_only_its_period(self):
+        self.harian()
+        bulanan = self.request(self.admin, 'get', '/api/laporan/bulanan/', {'month': 3, 'year': 2024})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sell(self.kasir2, local(2024, 3, 12, 16, 0), 5000, (self.roti, 1))
+        with CaptureQueriesContext(connection) as queries:
+            self.harian()
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sell(self.kasir2, local(2024, 3, 4, 16, 0), 5000, (self.roti, 1))
+        self.assertEqual(self.harian().data['penjualan']['total_penjualan'], 23000)
+
+        again = self.request(self.admin, 'get', '/api/laporan/bulanan/', {'month': 3, 'year': 2024})
+        self.assertEqual(again.data['penjualan']['total_penjualan'], 49000)
+        self.assertNotEqual(again['ETag'], bulanan['ETag'])
+
+    def test_expense_invalidates_report(self):
+        self.harian()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spend(self.kasir, local(2024, 3, 4, 18, 0), 1000)
+        self.assertEqual(self.harian().data['pengeluaran']['total_pengeluaran'], 5000)
+
+    def test_lost_generation_never_matches_old_entries(self):
+        self.harian()
+        DailyKasirSales.objects.filter(tanggal=date(2024, 3, 4)).update(total_penjualan=0)
+        cache.delete_many(['laporan:gen', 'laporan:gen:hari:2024-03-04'])
+
+        self.assertEqual(self.harian().data['penjualan']['total_penjualan'], 0)
+
+
+class ExportJobTests(ReportDataTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def submit(self, **data):
+        return self.request(self.admin, 'post', '/api/export/jobs/', data)
+
+    def run_queue(self):
+        while (job := claim_next()) is not None:
+            self.assertEqual(job.status, ExportJob.RUNNING)
+            run(job)
+
+    def test_rekap_job_lifecycle_and_reuse(self):
+        queued = self.submit(type='rekap_kantin', month=3, year=2024)
+        self.assertEqual(queued.status_code, 202)
+        job_id = queued.data['job']['id']
+        self.assertEqual(queued.data['job']['status'], 'pending')
+        self.assertEqual(self.submit(type='rekap_kantin', month='3', year='2024').data['job']['id'], job_id)
+
+        self.run_queue()
+
+        detail = self.request(self.admin, 'get', f'/api/export/jobs/{job_id}/').data['job']
+        self.assertEqual((detail['status'], detail['progress']), ('done', 100))
+        self.assertTrue(detail['download_url'])
+        job = ExportJob.objects.get(pk=job_id)
+        with job.file.open('rb') as f:
+            rows = list(load_workbook(f).active.iter_rows(values_only=True))
+        self.assertEqual([row[6] for row in rows[2:]], [6, 3])
+
+        reused = self.submit(type='rekap_kantin', month=3, year=2024)
+        self.assertEqual((reused.status_code, reused.data['job']['id'], reused.data['job']['reused']), (200, job_id, True))
+
+        # The rekap prints current stock, so a stock change means a new file.
+        self.pay(self.kasir, [(self.roti, 1)], 5000)
+        self.assertEqual(self.submit(type='rekap_kantin', month=3, year=2024).status_code, 202)
+
+    def test_riwayat_job_and_backfill(self):
+        job_id = self.submit(type='riwayat', format='ndjson', start='2024-03-01', end='2024-03-31').data['job']['id']
+        self.run_queue()
+
+        with ExportJob.objects.get(pk=job_id).file.open('rb') as f:
+            lines = [json.loads(line) for line in f.read().decode().splitlines()]
+        self.assertEqual(len(lines), 4)
+
+        self.assertEqual(
+            self.submit(type='riwayat', format='ndjson', start='2024-03-01', end='2024-03-31').data['job']['id'],
+            job_id
+        )
+        self.sell(self.kasir, local(2024, 3, 20, 10, 0), 5000, (self.roti, 1))
+        self.assertNotEqual(
+            self.submit(type='riwayat', format='ndjson', start='2024-03-01', end='2024-03-31').data['job']['id'],
+            job_id
+        )
+
+    def test_invalid_params_are_rejected(self):
+        for data in (
+            {'type': 'laporan'},
+            {'type': 'riwayat', 'start': 20240301},
+            {'type': 'riwayat', 'end': ['2024-03-01']},
+            {'type': 'riwayat', 'format': 'xml'},
+            {'type': 'rekap_kantin', 'date': {'tanggal': '2024-03-01'}},
+            {'type': 'rekap_kantin', 'date': '2024-02-30'},
+            {'type': 'rekap_kantin', 'month': [3], 'year': 2024},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.submit(**data).status_code, 400)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_stale_and_failed_jobs(self):
+        job = ExportJob.objects.create(kind='riwayat', params={'format': 'csv', 'start': None, 'end': 'rusak'})
+        with self.assertLogs('reports.jobs', 'ERROR'):
+            run(claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.FAILED)
+        self.assertTrue(job.error)
+
+        long_ago = timezone.now() - timedelta(days=1)
+        retry = ExportJob.objects.create(kind='riwayat', params={}, status=ExportJob.RUNNING, started_at=long_ago, attempts=1)
+        dead = ExportJob.objects.create(kind='riwayat', params={}, status=ExportJob.RUNNING, started_at=long_ago, attempts=MAX_ATTEMPTS)
+
+        self.assertEqual(requeue_stale(), 2)
+        retry.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual((retry.status, dead.status), (ExportJob.PENDING, ExportJob.FAILED))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTestCase(ApiTestCase):
+    """
+    Seeds a few weeks of sales and expenses, then checks the plan of every
+    SELECT an endpoint runs with ``assertIndexed``.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.products = [
+            cls.make_product(
+                f'Produk {i}',
+                price=1000 + i * 500,
+                stock_kantin=1000,
+                stock_gudang=1000,
+                category=f'Kategori {i % 4}'
+            )
+            for i in range(30)
+        ]
+
+        now = timezone.now()
+        for user, offset in ((cls.kasir, 0), (cls.kasir2, 1)):
+            sync_sales(user, [
+                {
+                    'client_ref': f'{user.username}-{i}',
+                    'created_at': (now - timedelta(hours=i * 5 + offset)).isoformat(),
+                    'uang_bayar': 100000,
+                    'items': [
+                        {'product_id': cls.products[(i + offset) % 30].id, 'qty': 1},
+                        {'product_id': cls.products[(i * 7) % 30].id, 'qty': 2},
+                    ],
+                }
+                for i in range(150)
+            ])
+
+        for i in range(20):
+            expense = Expense.objects.create(user=cls.kasir, deskripsi=f'Belanja {i}', jumlah=5000)
+            record_expense(expense)
+
+        cls.today = timezone.localdate()
+
+    def assertIndexed(self, user, url, data=None, method='get', allow=()):
+        """
+        Call the endpoint and fail when any SELECT it runs scans a hot table
+        (other than those in ``allow``) or sorts rows it could read in order.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request(user, method, url, data)
+        self.assertLess(response.status_code, 300, getattr(response, 'data', None))
+
+        failures = []
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = query_plan(sql)
+            problems = plan_problems(plan, allow)
+            if problems:
+                failures.append(f'{sql}\n    plan: {plan}\n    problem: {problems}')
+
+        self.assertFalse(failures, f'{url} regressed to a full scan:\n' + '\n'.join(failures))
+        return response
+
+
+class ReportQueryPlanTests(QueryPlanTestCase):
+    def test_laporan_harian(self):
+        self.assertIndexed(self.admin, '/api/laporan/harian/', {'date': self.today.isoformat()})
+
+    def test_laporan_bulanan(self):
+        self.assertIndexed(self.admin, '/api/laporan/bulanan/', {'month': self.today.month, 'year': self.today.year})
+
+    def test_laporan_tahunan(self):
+        self.assertIndexed(self.admin, '/api/laporan/tahunan/', {'year': self.today.year})
+
+    def test_laporan_multi_tahunan(self):
+        self.assertIndexed(self.admin, '/api/laporan/multi-tahunan/', {
+            'start_year': self.today.year - 2,
+            'end_year': self.today.year
+        })
+
+    def test_laporan_range(self):
+        for granularity in ('day', 'week', 'month'):
+            self.assertIndexed(self.admin, '/api/laporan/range/', {
+                'start': (self.today - timedelta(days=30)).isoformat(),
+                'end': self.today.isoformat(),
+                'granularity': granularity,
+                'detail': 1
+            })
+
+    def test_laporan_shift(self):
+        self.assertIndexed(self.admin, '/api/laporan/shift/')
+        self.assertIndexed(self.admin, '/api/laporan/shift/', {'kasir': self.kasir.id})
+
+    def test_laporan_heatmap(self):
+        self.assertIndexed(self.admin, '/api/laporan/heatmap/', {
+            'start': (self.today - timedelta(days=30)).isoformat(),
+            'end': self.today.isoformat()
+        })
+
+    def test_export_rekap_kantin(self):
+        self.assertIndexed(self.admin, '/api/kantin/rekap/export-excel/', {
+            'month': self.today.month,
+            'year': self.today.year
+        })
@@ -3,17 +3,30 @@ from .views import (
     laporan_harian,
     laporan_bulanan,
     laporan_tahunan,
-    export_rekap_kantin_excel
+    laporan_multi_tahunan,
+    laporan_range,
+    laporan_shift,
+    laporan_heatmap,
+    export_rekap_kantin_excel,
+    export_jobs,
+    export_job_detail
 )
 
 urlpatterns = [
     path('laporan/harian/', laporan_harian),
     path('laporan/bulanan/', laporan_bulanan),
     path('laporan/tahunan/', laporan_tahunan),
+    path('laporan/multi-tahunan/', laporan_multi_tahunan),
+    path('laporan/range/', laporan_range),
+    path('laporan/shift/', laporan_shift),
+    path('laporan/heatmap/', laporan_heatmap),
 
     path(
         'kantin/rekap/export-excel/',
         export_rekap_kantin_excel,
         name='export_rekap_kantin_excel'
     ),
+
+    path('export/jobs/', export_jobs),
+    path('export/jobs/<int:pk>/', export_job_detail),
 ]
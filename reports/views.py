@@ -1,52 +1,122 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import BasePermission
-from django.db.models import Sum
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractIsoWeekDay, TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from calendar import monthrange
-from django.http import HttpResponse
+from django.http import FileResponse
 
-from transactions.models import Transaction
+from transactions.models import Transaction, TransactionItem
 from expenses.models import Expense
 
-from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
 
+from .cache import cached_report
+from .excel import write_rekap_kantin
+from .jobs import submit
+from .models import DailyExpense, DailyKasirSales, DailyProductSales, ExportJob
+from .periode import periode_rekap, rentang_bulan
 
-from produks.models import KantinProduct
-from transactions.models import TransactionItem
+
+MAX_TAHUN_LAPORAN = 20
+MAX_HARI_RANGE_HARIAN = 366
+
+NAMA_HARI = ['Senin', 'Selasa', 'Rabu', 'Kamis', 'Jumat', 'Sabtu', 'Minggu']
+
+GRANULARITAS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
 
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == 'admin'
 
+
+def _periode_harian(request):
+    tanggal = request.query_params.get('date')
+    tanggal = parse_date(tanggal) if tanggal else None
+    return (tanggal, tanggal) if tanggal else None
+
+
+def _periode_bulanan(request):
+    month = request.query_params.get('month')
+    year = request.query_params.get('year')
+    if not month or not year:
+        return None
+    awal, akhir = rentang_bulan(int(month), int(year))
+    return awal, akhir - timedelta(days=1)
+
+
+def _periode_tahunan(request):
+    year = request.query_params.get('year')
+    if not year:
+        return None
+    return date(int(year), 1, 1), date(int(year), 12, 31)
+
+
+def _periode_multi_tahunan(request):
+    start_year = request.query_params.get('start_year')
+    end_year = request.query_params.get('end_year')
+    if not start_year or not end_year:
+        return None
+    start_year, end_year = int(start_year), int(end_year)
+    if start_year > end_year or end_year - start_year >= MAX_TAHUN_LAPORAN:
+        return None
+    return date(start_year, 1, 1), date(end_year, 12, 31)
+
+
+def _periode_range(request):
+    try:
+        start = parse_date(request.query_params.get('start') or '')
+        end = parse_date(request.query_params.get('end') or '')
+    except ValueError:
+        # Well formed but impossible, e.g. 2024-02-30.
+        return None
+    if start is None or end is None or start > end:
+        return None
+    return start, end
+
+
 @api_view(['GET'])
 @permission_classes([IsAdmin])
+@cached_report('harian', _periode_harian)
 def laporan_harian(request):
     date = request.query_params.get('date')
     if not date:
         return Response({'error': 'Parameter date wajib'}, status=400)
 
-    transaksi = Transaction.objects.filter(created_at__date=date)
-    pengeluaran = Expense.objects.filter(tanggal=date)
+    transaksi = (
+        Transaction.objects
+        .filter(business_date=date)
+        .select_related('user')
+        .prefetch_related('items')
+    )
+    pengeluaran = Expense.objects.filter(tanggal=date).select_related('user')
+
+    penjualan = DailyKasirSales.objects.filter(tanggal=date).aggregate(
+        total=Sum('total_penjualan'),
+        jumlah=Sum('total_transaksi')
+    )
+    total_penjualan = penjualan['total'] or 0
 
     detail_transaksi = []
-    total_penjualan = 0
 
     for trx in transaksi:
         items = []
         for item in trx.items.all():
             items.append({
-                'produk': item.product.name,
+                'produk': item.product_name,
                 'qty': item.qty,
                 'subtotal': item.subtotal
             })
 
-        total_penjualan += trx.total
-
         detail_transaksi.append({
             'invoice': trx.invoice,
             'kasir': trx.user.username,
@@ -54,8 +124,8 @@ def laporan_harian(request):
             'total': trx.total
         })
 
-    total_pengeluaran = pengeluaran.aggregate(
-        total=Sum('jumlah')
+    total_pengeluaran = DailyExpense.objects.filter(tanggal=date).aggregate(
+        total=Sum('total_pengeluaran')
     )['total'] or 0
 
     return Response({
@@ -63,7 +133,7 @@ def laporan_harian(request):
         'periode': 'Harian',
         'tanggal': date,
         'penjualan': {
-            'total_transaksi': transaksi.count(),
+            'total_transaksi': penjualan['jumlah'] or 0,
             'total_penjualan': total_penjualan,
             'detail': detail_transaksi
         },
@@ -86,6 +156,7 @@ def laporan_harian(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
+@cached_report('bulanan', _periode_bulanan)
 def laporan_bulanan(request):
     month = request.query_params.get('month')
     year = request.query_params.get('year')
@@ -93,22 +164,26 @@ def laporan_bulanan(request):
     if not month or not year:
         return Response({'error': 'month dan year wajib'}, status=400)
 
-    transaksi = Transaction.objects.filter(
-        created_at__month=month,
-        created_at__year=year
+    try:
+        awal, akhir = rentang_bulan(int(month), int(year))
+    except ValueError:
+        return Response({'error': 'month atau year tidak valid'}, status=400)
+
+    penjualan = DailyKasirSales.objects.filter(
+        tanggal__gte=awal,
+        tanggal__lt=akhir
+    ).aggregate(
+        total=Sum('total_penjualan'),
+        jumlah=Sum('total_transaksi')
     )
 
-    pengeluaran = Expense.objects.filter(
-        tanggal__month=month,
-        tanggal__year=year
-    )
+    total_penjualan = penjualan['total'] or 0
 
-    total_penjualan = transaksi.aggregate(
-        total=Sum('total')
-    )['total'] or 0
-
-    total_pengeluaran = pengeluaran.aggregate(
-        total=Sum('jumlah')
+    total_pengeluaran = DailyExpense.objects.filter(
+        tanggal__gte=awal,
+        tanggal__lt=akhir
+    ).aggregate(
+        total=Sum('total_pengeluaran')
     )['total'] or 0
 
     return Response({
@@ -118,7 +193,7 @@ def laporan_bulanan(request):
         'tahun': year,
         'penjualan': {
             'total_penjualan': total_penjualan,
-            'total_transaksi': transaksi.count()
+            'total_transaksi': penjualan['jumlah'] or 0
         },
         'pengeluaran': {
             'total_pengeluaran': total_pengeluaran
@@ -130,31 +205,59 @@ def laporan_bulanan(request):
         }
     })
 
+def _grafik_bulanan(start_year, end_year):
+    """
+    Sales and expenses per month for ``start_year``..``end_year`` with one
+    grouped query per source over a plain date range on ``tanggal``.
+    Returns ``{year: [12 month rows]}`` with empty months filled in.
+    """
+    periode = {
+        'tanggal__gte': date(start_year, 1, 1),
+        'tanggal__lt': date(end_year + 1, 1, 1),
+    }
+
+    penjualan = {
+        row['bulan']: row['total']
+        for row in DailyKasirSales.objects.filter(**periode)
+        .annotate(bulan=TruncMonth('tanggal'))
+        .values('bulan')
+        .annotate(total=Sum('total_penjualan'))
+        .order_by()
+    }
+    pengeluaran = {
+        row['bulan']: row['total']
+        for row in DailyExpense.objects.filter(**periode)
+        .annotate(bulan=TruncMonth('tanggal'))
+        .values('bulan')
+        .annotate(total=Sum('total_pengeluaran'))
+        .order_by()
+    }
+
+    return {
+        year: [
+            {
+                'bulan': f"{month:02d}",
+                'penjualan': penjualan.get(date(year, month, 1), 0),
+                'pengeluaran': pengeluaran.get(date(year, month, 1), 0)
+            }
+            for month in range(1, 13)
+        ]
+        for year in range(start_year, end_year + 1)
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAdmin])
+@cached_report('tahunan', _periode_tahunan)
 def laporan_tahunan(request):
     year = request.query_params.get('year')
     if not year:
         return Response({'error': 'year wajib'}, status=400)
 
-    grafik = []
-
-    for month in range(1, 13):
-        penjualan = Transaction.objects.filter(
-            created_at__year=year,
-            created_at__month=month
-        ).aggregate(total=Sum('total'))['total'] or 0
-
-        pengeluaran = Expense.objects.filter(
-            tanggal__year=year,
-            tanggal__month=month
-        ).aggregate(total=Sum('jumlah'))['total'] or 0
-
-        grafik.append({
-            'bulan': f"{month:02d}",
-            'penjualan': penjualan,
-            'pengeluaran': pengeluaran
-        })
+    try:
+        grafik = _grafik_bulanan(int(year), int(year))[int(year)]
+    except ValueError:
+        return Response({'error': 'year tidak valid'}, status=400)
 
     total_penjualan = sum(g['penjualan'] for g in grafik)
     total_pengeluaran = sum(g['pengeluaran'] for g in grafik)
@@ -177,113 +280,449 @@ def laporan_tahunan(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
-def export_rekap_kantin_excel(request):
-    date = request.query_params.get('date')
-    month = request.query_params.get('month')
-    year = request.query_params.get('year')
+@cached_report('multi_tahunan', _periode_multi_tahunan)
+def laporan_multi_tahunan(request):
+    start_year = request.query_params.get('start_year')
+    end_year = request.query_params.get('end_year')
+    if not start_year or not end_year:
+        return Response({'error': 'start_year dan end_year wajib'}, status=400)
+
+    try:
+        start_year, end_year = int(start_year), int(end_year)
+        if start_year > end_year or end_year - start_year >= MAX_TAHUN_LAPORAN:
+            raise ValueError
+        grafik = _grafik_bulanan(start_year, end_year)
+    except ValueError:
+        return Response({'error': f'Rentang tahun tidak valid (maksimal {MAX_TAHUN_LAPORAN} tahun)'}, status=400)
+
+    tahunan = []
+    for year, bulan in grafik.items():
+        penjualan = sum(g['penjualan'] for g in bulan)
+        pengeluaran = sum(g['pengeluaran'] for g in bulan)
+        tahunan.append({
+            'tahun': year,
+            'penjualan': penjualan,
+            'pengeluaran': pengeluaran,
+            'laba_bersih': penjualan - pengeluaran,
+            'grafik': bulan
+        })
 
-    today = datetime.today()
-
-    trx_filter = {}
-    if date:
-        trx_filter['transaction__created_at__date'] = date
-        periode = date
-    elif month and year:
-        trx_filter['transaction__created_at__month'] = month
-        trx_filter['transaction__created_at__year'] = year
-        periode = f"{month}-{year}"
-    elif year:
-        trx_filter['transaction__created_at__year'] = year
-        periode = year
-    else:
-        trx_filter['transaction__created_at__date'] = today.date()
-        periode = today.strftime('%Y-%m-%d')
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Rekap Stok Kantin'
-
-    bold_font = Font(bold=True)
-    center_align = Alignment(horizontal='center', vertical='center')
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    total_penjualan = sum(t['penjualan'] for t in tahunan)
+    total_pengeluaran = sum(t['pengeluaran'] for t in tahunan)
+
+    return Response({
+        'status': True,
+        'periode': 'Multi Tahunan',
+        'tahun_awal': start_year,
+        'tahun_akhir': end_year,
+        'penjualan': {
+            'total_penjualan': total_penjualan
+        },
+        'pengeluaran': {
+            'total_pengeluaran': total_pengeluaran
+        },
+        'ringkasan': {
+            'laba_bersih': total_penjualan - total_pengeluaran
+        },
+        'tahunan': tahunan
+    })
+
+def _awal_bucket(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_berikutnya(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return rentang_bulan(day.month, day.year)[1]
+    return day + timedelta(days=1)
+
+
+def _grouped(queryset, granularity, *fields, **aggregates):
+    return (
+        queryset
+        .annotate(bucket=GRANULARITAS[granularity]('tanggal'))
+        .values('bucket', *fields)
+        .annotate(**aggregates)
+        .order_by()
     )
 
-    ws.merge_cells('A1:I1')
-    ws['A1'] = f'REKAP STOK KANTIN ({periode})'
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A1'].alignment = center_align
-
-    headers = [
-        'No',
-        'Nama Barang',
-        'Stok Masuk',
-        'Stok Awal',
-        'Jumlah Stok',
-        'Satuan',
-        'Terjual',
-        'Sisa Stok',
-        'Harga'
-    ]
 
-    ws.append(headers)
-
-    header_row = 2
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=header_row, column=col)
-        cell.font = bold_font
-        cell.alignment = center_align
-        cell.border = thin_border
-
-    kantin_products = KantinProduct.objects.select_related('product_gudang')
-
-    row = 3
-    no = 1
-    for kp in kantin_products:
-        terjual = TransactionItem.objects.filter(
-            product=kp,
-            **trx_filter
-        ).aggregate(total=Sum('qty'))['total'] or 0
-
-        stok_awal = kp.stock_kantin + terjual
-        stok_masuk = 0
-        jumlah_stok = stok_awal + stok_masuk
-
-        data = [
-            no,
-            kp.product_gudang.name,
-            stok_masuk,
-            stok_awal,
-            jumlah_stok,
-            kp.product_gudang.satuan,
-            terjual,
-            kp.stock_kantin,
-            kp.product_gudang.price
-        ]
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+@cached_report('range', _periode_range)
+def laporan_range(request):
+    """
+    Sales, expenses and net profit for ``start``..``end`` (inclusive) in
+    day, week (Monday-based) or month buckets, with one grouped query per
+    rollup. ``detail=1`` adds per-product sales for each bucket.
+    """
+    granularity = request.query_params.get('granularity', 'day')
+    if granularity not in GRANULARITAS:
+        return Response({'error': 'granularity harus day, week atau month'}, status=400)
+
+    bounds = _periode_range(request)
+    if bounds is None:
+        return Response({'error': 'start dan end wajib (YYYY-MM-DD), start <= end'}, status=400)
+    start, end = bounds
+
+    if granularity == 'day' and (end - start).days >= MAX_HARI_RANGE_HARIAN:
+        return Response({'error': f'Rentang harian maksimal {MAX_HARI_RANGE_HARIAN} hari'}, status=400)
+    if end.year - start.year >= MAX_TAHUN_LAPORAN:
+        return Response({'error': f'Rentang maksimal {MAX_TAHUN_LAPORAN} tahun'}, status=400)
+
+    periode = {'tanggal__gte': start, 'tanggal__lte': end}
+
+    penjualan = {
+        row['bucket']: row
+        for row in _grouped(
+            DailyKasirSales.objects.filter(**periode),
+            granularity,
+            total=Sum('total_penjualan'),
+            jumlah=Sum('total_transaksi')
+        )
+    }
+    pengeluaran = {
+        row['bucket']: row['total']
+        for row in _grouped(
+            DailyExpense.objects.filter(**periode),
+            granularity,
+            total=Sum('total_pengeluaran')
+        )
+    }
+
+    detail = request.query_params.get('detail') in ('1', 'true')
+    produk = {}
+    if detail:
+        for row in _grouped(
+            DailyProductSales.objects.filter(**periode),
+            granularity,
+            'product_name',
+            'product_category',
+            qty=Sum('qty'),
+            pendapatan=Sum('pendapatan')
+        ).order_by('bucket', '-pendapatan'):
+            produk.setdefault(row['bucket'], []).append({
+                'produk': row['product_name'],
+                'kategori': row['product_category'],
+                'qty': row['qty'],
+                'pendapatan': row['pendapatan']
+            })
+
+    buckets = []
+    bucket = _awal_bucket(start, granularity)
+    while bucket <= end:
+        berikutnya = _bucket_berikutnya(bucket, granularity)
+        jual = penjualan.get(bucket, {})
+        total_penjualan = jual.get('total') or 0
+        total_pengeluaran = pengeluaran.get(bucket) or 0
+
+        data = {
+            'mulai': max(bucket, start),
+            'selesai': min(berikutnya - timedelta(days=1), end),
+            'total_transaksi': jual.get('jumlah') or 0,
+            'penjualan': total_penjualan,
+            'pengeluaran': total_pengeluaran,
+            'laba_bersih': total_penjualan - total_pengeluaran
+        }
+        if detail:
+            data['produk'] = produk.get(bucket, [])
+        buckets.append(data)
+        bucket = berikutnya
+
+    total_penjualan = sum(b['penjualan'] for b in buckets)
+    total_pengeluaran = sum(b['pengeluaran'] for b in buckets)
+
+    return Response({
+        'status': True,
+        'periode': 'Range',
+        'start': start,
+        'end': end,
+        'granularity': granularity,
+        'ringkasan': {
+            'total_transaksi': sum(b['total_transaksi'] for b in buckets),
+            'total_penjualan': total_penjualan,
+            'total_pengeluaran': total_pengeluaran,
+            'laba_bersih': total_penjualan - total_pengeluaran
+        },
+        'buckets': buckets
+    })
 
-        ws.append(data)
+def _waktu_shift(value, akhir=False):
+    """
+    Parse a shift boundary: an ISO datetime (local time when naive) or a
+    date, meaning its local midnight, or the next one for ``akhir``.
+    """
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if akhir else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'Waktu tidak valid: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
-        for col in range(1, len(data) + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.border = thin_border
-            if col in [1, 3, 4, 5, 7, 8, 9]:
-                cell.alignment = center_align
 
-        row += 1
-        no += 1
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def laporan_shift(request):
+    """
+    Drawer reconciliation per kasir for ``[start, end)``, ``end`` defaulting
+    to the end of ``start``'s business day: sales per payment method, cash
+    taken in, change handed out, expenses paid and the cash the drawer
+    should hold. One grouped query over transactions and one over expenses,
+    whatever the number of kasirs.
+    """
+    params = request.query_params
+    today = timezone.localdate().isoformat()
+
+    try:
+        start = _waktu_shift(params.get('start') or today)
+        if params.get('end'):
+            end = _waktu_shift(params['end'], akhir=True)
+        else:
+            # Until the end of the business day the shift started on.
+            end = _waktu_shift(timezone.localdate(start).isoformat(), akhir=True)
+        modal_awal = Decimal(params.get('modal_awal') or 0)
+        if not modal_awal.is_finite():
+            raise InvalidOperation(modal_awal)
+        kasir = int(params['kasir']) if params.get('kasir') else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    except InvalidOperation:
+        return Response({'error': 'modal_awal tidak valid'}, status=400)
+
+    if start >= end:
+        return Response({'error': 'start harus sebelum end'}, status=400)
+
+    transaksi = Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    pengeluaran = Expense.objects.filter(created_at__gte=start, created_at__lt=end)
+    if kasir:
+        transaksi = transaksi.filter(user_id=kasir)
+        pengeluaran = pengeluaran.filter(user_id=kasir)
+
+    tunai = Q(payment_method='cash')
+    per_metode = {
+        f'metode_{method}': Sum('total', filter=Q(payment_method=method))
+        for method, _ in Transaction.PAYMENT_METHODS
+    }
+
+    rows = {}
+    for row in (
+        transaksi
+        .values('user_id', 'user__username')
+        .annotate(
+            jumlah=Count('id'),
+            penjualan=Sum('total'),
+            diterima=Sum('cash_given', filter=tunai),
+            kembalian=Sum('change', filter=tunai),
+            **per_metode
+        )
+        .order_by()
+    ):
+        rows[row['user_id']] = row
+
+    for row in (
+        pengeluaran
+        .values('user_id', 'user__username')
+        .annotate(jumlah_pengeluaran=Count('id'), pengeluaran=Sum('jumlah'))
+        .order_by()
+    ):
+        rows.setdefault(row['user_id'], {'user_id': row['user_id'], 'user__username': row['user__username']}).update(row)
+
+    hasil = []
+    for row in sorted(rows.values(), key=lambda r: r['user__username']):
+        diterima = row.get('diterima') or 0
+        kembalian = row.get('kembalian') or 0
+        biaya = row.get('pengeluaran') or 0
+
+        hasil.append({
+            'kasir_id': row['user_id'],
+            'kasir': row['user__username'],
+            'total_transaksi': row.get('jumlah', 0),
+            'penjualan_kotor': row.get('penjualan') or 0,
+            'per_metode': {
+                method: row.get(f'metode_{method}') or 0
+                for method, _ in Transaction.PAYMENT_METHODS
+            },
+            'uang_diterima': diterima,
+            'kembalian': kembalian,
+            'jumlah_pengeluaran': row.get('jumlah_pengeluaran', 0),
+            'pengeluaran': biaya,
+            'modal_awal': modal_awal,
+            'saldo_laci': modal_awal + diterima - kembalian - biaya
+        })
 
-    for col in range(1, 10):
-        ws.column_dimensions[get_column_letter(col)].width = 18
+    return Response({
+        'status': True,
+        'periode': 'Shift',
+        'start': timezone.localtime(start),
+        'end': timezone.localtime(end),
+        'kasir': hasil,
+        'ringkasan': {
+            'total_transaksi': sum(k['total_transaksi'] for k in hasil),
+            'penjualan_kotor': sum(k['penjualan_kotor'] for k in hasil),
+            'uang_diterima': sum(k['uang_diterima'] for k in hasil),
+            'kembalian': sum(k['kembalian'] for k in hasil),
+            'pengeluaran': sum(k['pengeluaran'] for k in hasil),
+            'saldo_laci': sum(k['saldo_laci'] for k in hasil)
+        }
+    })
 
-    response = HttpResponse(
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+@cached_report('heatmap', _periode_range)
+def laporan_heatmap(request):
+    """
+    Transaction count and revenue per (weekday, local hour) over
+    ``start``..``end``, from the stored business date/hour with one grouped
+    query, plus the same per product category from a second one.
+    """
+    bounds = _periode_range(request)
+    if bounds is None:
+        return Response({'error': 'start dan end wajib (YYYY-MM-DD), start <= end'}, status=400)
+    start, end = bounds
+
+    if end.year - start.year >= MAX_TAHUN_LAPORAN:
+        return Response({'error': f'Rentang maksimal {MAX_TAHUN_LAPORAN} tahun'}, status=400)
+
+    per_jam = {
+        (row['hari'], row['business_hour']): row
+        for row in Transaction.objects
+        .filter(business_date__gte=start, business_date__lte=end)
+        .annotate(hari=ExtractIsoWeekDay('business_date'))
+        .values('hari', 'business_hour')
+        .annotate(jumlah=Count('id'), pendapatan=Sum('total'))
+        .order_by()
+    }
+
+    heatmap = []
+    for hari, nama in enumerate(NAMA_HARI, start=1):
+        heatmap.append({
+            'hari': nama,
+            'weekday': hari,
+            'jam': [
+                {
+                    'jam': jam,
+                    'total_transaksi': per_jam.get((hari, jam), {}).get('jumlah', 0),
+                    'pendapatan': per_jam.get((hari, jam), {}).get('pendapatan') or 0
+                }
+                for jam in range(24)
+            ]
+        })
+
+    kategori = [
+        {
+            'kategori': row['product_category'],
+            'hari': NAMA_HARI[row['hari'] - 1],
+            'weekday': row['hari'],
+            'jam': row['transaction__business_hour'],
+            'total_transaksi': row['jumlah'],
+            'qty': row['qty'],
+            'pendapatan': row['pendapatan']
+        }
+        for row in TransactionItem.objects
+        .filter(transaction__business_date__gte=start, transaction__business_date__lte=end)
+        .annotate(hari=ExtractIsoWeekDay('transaction__business_date'))
+        .values('product_category', 'hari', 'transaction__business_hour')
+        .annotate(
+            jumlah=Count('transaction_id', distinct=True),
+            qty=Sum('qty'),
+            pendapatan=Sum('subtotal')
+        )
+        .order_by('product_category', 'hari', 'transaction__business_hour')
+    ]
+
+    return Response({
+        'status': True,
+        'periode': 'Heatmap',
+        'start': start,
+        'end': end,
+        'heatmap': heatmap,
+        'kategori': kategori
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def export_rekap_kantin_excel(request):
+    if request.query_params.get('async') in ('1', 'true'):
+        return _ajukan_export(request, 'rekap_kantin', request.query_params)
+
+    try:
+        awal, akhir, periode = periode_rekap(request.query_params)
+    except ValueError:
+        return Response({'error': 'Periode tidak valid'}, status=400)
+
+    trx_filter = {
+        'transaction__business_date__gte': awal,
+        'transaction__business_date__lt': akhir,
+    }
+
+    export_file = tempfile.TemporaryFile()
+    write_rekap_kantin(export_file, trx_filter, periode)
+    export_file.seek(0)
+
+    return FileResponse(
+        export_file,
+        as_attachment=True,
+        filename=f'rekap_kantin_{periode}.xlsx',
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = (
-        f'attachment; filename=rekap_kantin_{periode}.xlsx'
+
+
+def _export_job_data(request, job, reused=False):
+    return {
+        'id': job.id,
+        'type': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'params': job.params,
+        'reused': reused,
+        'error': job.error or None,
+        'download_url': request.build_absolute_uri(job.file.url) if job.status == ExportJob.DONE else None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def _ajukan_export(request, kind, params):
+    try:
+        job, reused = submit(request.user, kind, params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response(
+        {'status': True, 'job': _export_job_data(request, job, reused)},
+        status=200 if job.status == ExportJob.DONE else 202
     )
 
-    wb.save(response)
-    return response
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdmin])
+def export_jobs(request):
+    if request.method == 'POST':
+        return _ajukan_export(request, request.data.get('type'), request.data)
+
+    jobs = ExportJob.objects.filter(requested_by=request.user).order_by('-created_at')[:20]
+    return Response({
+        'status': True,
+        'results': [_export_job_data(request, job) for job in jobs]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def export_job_detail(request, pk):
+    try:
+        job = ExportJob.objects.get(pk=pk)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export tidak ditemukan'}, status=404)
+
+    return Response({'status': True, 'job': _export_job_data(request, job)})
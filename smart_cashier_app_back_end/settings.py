@@ -149,8 +149,39 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Invoice numbers reserved per worker process at a time. Values above 1 take
+# load off the sequence row at the cost of gaps after a restart.
+INVOICE_BLOCK_SIZE = 1
+
+# How long (seconds) a payment Idempotency-Key is remembered, and how long a
+# duplicate request waits for the first one to finish before giving up.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_WAIT_TIMEOUT = 15
+# A key still pending after this many seconds belongs to a request that died
+# mid-checkout (its sale rolled back) and is handed to the next retry.
+IDEMPOTENCY_PROCESSING_TIMEOUT = 120
+
+# Report responses are cached per period (see reports.cache). Use a backend
+# shared by all workers (Redis, Memcached or the database cache) in
+# production so write invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a report may be served from cache for a period that has not ended
+# yet, and for a closed one (None: until evicted). Writes invalidate both
+# right away.
+REPORT_CACHE_TIMEOUT = 300
+REPORT_CACHE_CLOSED_TIMEOUT = None
+
+# Background exports (reports.jobs): worker threads per run_export_jobs
+# process, and seconds after which a running job is assumed dead and requeued.
+EXPORT_WORKERS = 2
+EXPORT_JOB_TIMEOUT = 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
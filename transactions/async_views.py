@@ -0,0 +1,65 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from users.authentication import aauthenticate
+from .idempotency import execute
+from .pagination import page_size
+from .views import history_page, history_queryset, payment_response
+
+
+def _json(data, status=200, headers=None):
+    return JsonResponse(data, encoder=JSONEncoder, safe=False, status=status, headers=headers)
+
+
+def _run_payment(user, data, key):
+    if key:
+        return execute(user, key, data, lambda: payment_response(user, data))
+    return payment_response(user, data)
+
+
+async def payment(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    user = await aauthenticate(request)
+    if user is None:
+        return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if user.role != 'kasir':
+        return _json({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return _json({'detail': 'JSON parse error.'}, status=400)
+    if not isinstance(data, dict):
+        return _json({'detail': 'JSON object expected.'}, status=400)
+
+    # Checkout needs an atomic block, which the async ORM does not offer yet.
+    response = await sync_to_async(_run_payment)(user, data, request.headers.get('Idempotency-Key'))
+    headers = {'Idempotent-Replayed': 'true'} if response.has_header('Idempotent-Replayed') else None
+    return _json(response.data, status=response.status_code, headers=headers)
+
+
+async def history(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    user = await aauthenticate(request)
+    if user is None:
+        return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        transactions = history_queryset(user, request.GET)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+
+    size = page_size(request.GET.get('page_size'))
+    page = [trx async for trx in transactions[:size + 1]]
+
+    return _json(history_page(page, size))
+
+
+payment.csrf_exempt = True
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import zlib
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Transaction, TransactionItem
+from .pagination import decode_cursor, encode_cursor, seek
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WINDOW = timedelta(days=31)
+GZIP_FLUSH_BYTES = 64 * 1024
+
+ITEM_FIELDS = (
+    'transaction_id',
+    'transaction__created_at',
+    'transaction__invoice',
+    'transaction__user__username',
+    'transaction__payment_method',
+    'transaction__total',
+    'transaction__cash_given',
+    'transaction__change',
+    'product_id',
+    'product_name',
+    'qty',
+    'price',
+    'subtotal',
+)
+
+CSV_HEADER = [
+    'invoice',
+    'created_at',
+    'kasir',
+    'payment_method',
+    'total',
+    'uang_bayar',
+    'kembalian',
+    'product_id',
+    'produk',
+    'qty',
+    'price',
+    'subtotal',
+    'cursor',
+]
+
+
+def _windows(start, end):
+    while start < end:
+        stop = min(start + EXPORT_WINDOW, end)
+        yield start, stop
+        start = stop
+
+
+def iter_item_rows(start=None, end=None, cursor=None):
+    """
+    Yield every transaction line between ``start`` and ``end`` in
+    ``(created_at, id)`` order, one ``values_list`` tuple at a time.
+
+    The range is split into ``EXPORT_WINDOW`` slices and each slice is read
+    through a server-side iterator, so memory stays flat and no single query
+    holds the database for the whole export. ``cursor`` resumes right after
+    the last transaction a previous export delivered.
+    """
+    end = end or timezone.now()
+    if start is None:
+        start = (
+            Transaction.objects
+            .order_by('created_at')
+            .values_list('created_at', flat=True)
+            .first()
+        )
+        if start is None:
+            return
+
+    if cursor:
+        start = max(start, decode_cursor(cursor)[0])
+
+    for window_start, window_end in _windows(start, end):
+        rows = seek(
+            TransactionItem.objects.filter(
+                transaction__created_at__gte=window_start,
+                transaction__created_at__lt=window_end
+            ),
+            cursor,
+            descending=False,
+            prefix='transaction__'
+        )
+        yield from (
+            rows
+            .order_by('transaction__created_at', 'transaction__id', 'id')
+            .values_list(*ITEM_FIELDS)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+
+def stream_ndjson(rows):
+    """One JSON line per transaction, with its items nested and a resume cursor."""
+    current = None
+    for row in rows:
+        (trx_id, created_at, invoice, kasir, method, total, cash, change,
+         product_id, name, qty, price, subtotal) = row
+
+        if current is None or current['id'] != trx_id:
+            if current is not None:
+                yield json.dumps(current, cls=DjangoJSONEncoder) + '\n'
+            current = {
+                'id': trx_id,
+                'invoice': invoice,
+                'created_at': timezone.localtime(created_at).isoformat(),
+                'kasir': kasir,
+                'payment_method': method,
+                'total': total,
+                'uang_bayar': cash,
+                'kembalian': change,
+                'items': [],
+                'cursor': encode_cursor(created_at, trx_id),
+            }
+
+        current['items'].append({
+            'product_id': product_id,
+            'produk': name,
+            'qty': qty,
+            'price': price,
+            'subtotal': subtotal,
+        })
+
+    if current is not None:
+        yield json.dumps(current, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_csv_gzip(rows):
+    """
+    One CSV row per line item, gzip-compressed on the fly. The resume cursor
+    is only filled in on the last row of each transaction, since resuming
+    skips the whole transaction; clients resume from the last non-empty one.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+
+    pending = None
+    for row in rows:
+        (trx_id, created_at, invoice, kasir, method, total, cash, change,
+         product_id, name, qty, price, subtotal) = row
+
+        # A row is written once the next one shows whether it closed its transaction.
+        if pending is not None:
+            line, last = pending
+            writer.writerow(line + [encode_cursor(*last) if last[1] != trx_id else ''])
+
+        pending = ([
+            invoice,
+            timezone.localtime(created_at).isoformat(),
+            kasir,
+            method,
+            total,
+            cash,
+            change,
+            product_id,
+            name,
+            qty,
+            price,
+            subtotal,
+        ], (created_at, trx_id))
+
+        if buffer.tell() >= GZIP_FLUSH_BYTES:
+            chunk = compressor.compress(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+
+    if pending is not None:
+        line, last = pending
+        writer.writerow(line + [encode_cursor(*last)])
+
+    yield compressor.compress(buffer.getvalue().encode()) + compressor.flush()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+
+POLL_INTERVAL = 0.1
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def abandoned_cutoff():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_PROCESSING_TIMEOUT)
+
+
+def purge_expired():
+    """Delete every key older than ``IDEMPOTENCY_KEY_TTL``; returns the number removed."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expiry_cutoff()).delete()
+    return deleted
+
+
+def fingerprint(data):
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def claim(user, key, request_hash):
+    """
+    Insert a pending row for ``key``. Returns ``(record, True)`` when this
+    request owns the key, or the existing row and ``False`` for a duplicate.
+    An expired row, or one left pending past ``IDEMPOTENCY_PROCESSING_TIMEOUT``
+    by a request that died, is dropped and the key claimed afresh.
+    """
+    for _ in range(2):
+        try:
+            with db_transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_hash=request_hash
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            abandoned = record.status_code is None and record.created_at < abandoned_cutoff()
+            if abandoned or record.created_at < expiry_cutoff():
+                # Conditional, so only one of several retries drops the row.
+                IdempotencyKey.objects.filter(
+                    pk=record.pk,
+                    status_code=record.status_code,
+                    created_at=record.created_at
+                ).delete()
+                continue
+            return record, False
+    return record, False
+
+
+def wait_for(record):
+    """Poll a pending key until the request that owns it stores its response."""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while record.status_code is None:
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+        if record is None:
+            return None
+    return record
+
+
+def execute(user, key, data, handler):
+    """
+    Run ``handler`` at most once per ``(user, key)`` and return its response.
+
+    The first request with a key runs ``handler`` and stores its response;
+    retries with the same key get the stored response back without running
+    it again, and a retry that arrives while the first request is still
+    running waits for it instead of executing in parallel. ``handler`` must
+    return a DRF ``Response``.
+    """
+    if len(key) > 255:
+        return Response({'error': 'Idempotency-Key is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    request_hash = fingerprint(data)
+    record, owner = claim(user, key, request_hash)
+
+    if not owner:
+        if record.request_hash != request_hash:
+            return Response(
+                {'error': 'Idempotency-Key was already used with a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        record = wait_for(record)
+        if record is None:
+            return Response(
+                {'error': 'A request with this Idempotency-Key is still being processed.'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return Response(
+            record.response,
+            status=record.status_code,
+            headers={'Idempotent-Replayed': 'true'}
+        )
+
+    try:
+        response = handler()
+    except Exception:
+        record.delete()
+        raise
+
+    if response.status_code >= 500:
+        record.delete()
+        return response
+
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        response=json.loads(json.dumps(response.data, cls=JSONEncoder))
+    )
+    return response
+
+
+def idempotent(view):
+    """Honour an ``Idempotency-Key`` header on a DRF function view, see ``execute``."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(request, *args, **kwargs)
+
+        return execute(
+            request.user,
+            key,
+            request.data,
+            lambda: view(request, *args, **kwargs)
+        )
+
+    return wrapper
@@ -0,0 +1,89 @@
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+
+
+INVOICE_PREFIX = 'INV'
+
+_lock = threading.Lock()
+_blocks = {}
+
+
+def format_invoice(year, number):
+    return f"{INVOICE_PREFIX}-{year}-{number:03d}"
+
+
+def _seed(year):
+    """Highest invoice number already issued for ``year`` before the sequence existed."""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    last = (
+        Transaction.objects
+        .filter(invoice__startswith=f"{INVOICE_PREFIX}-{year}-")
+        .order_by(Length('invoice').desc(), '-invoice')
+        .values_list('invoice', flat=True)
+        .first()
+    )
+    return int(last.split('-')[-1]) if last else 0
+
+
+def _reserve(year, count):
+    """Atomically advance the ``year`` sequence by ``count`` and return (first, last)."""
+    InvoiceSequence = apps.get_model('transactions', 'InvoiceSequence')
+    sequence = InvoiceSequence.objects.filter(year=year)
+
+    with db_transaction.atomic():
+        if not sequence.update(last_number=F('last_number') + count):
+            try:
+                with db_transaction.atomic():
+                    InvoiceSequence.objects.create(
+                        year=year,
+                        last_number=_seed(year) + count
+                    )
+            except IntegrityError:
+                sequence.update(last_number=F('last_number') + count)
+
+        last = sequence.values_list('last_number', flat=True).get()
+
+    return last - count + 1, last
+
+
+def reserve_invoices(count, year=None):
+    """Reserve ``count`` consecutive invoice numbers in one round trip."""
+    year = year or timezone.localdate().year
+    first, last = _reserve(year, count)
+    return [format_invoice(year, number) for number in range(first, last + 1)]
+
+
+def next_invoice():
+    """
+    Hand out the next invoice number for the current business year.
+
+    With ``INVOICE_BLOCK_SIZE`` above 1 each worker process reserves a block
+    of numbers at once and serves the rest from memory. The spare numbers are
+    only kept once the reservation commits, so a rolled back sale can leave a
+    gap but never a duplicate.
+    """
+    year = timezone.localdate().year
+
+    with _lock:
+        block = _blocks.get(year)
+        if block and block[0] <= block[1]:
+            number = block[0]
+            block[0] += 1
+            return format_invoice(year, number)
+
+    first, last = _reserve(year, getattr(settings, 'INVOICE_BLOCK_SIZE', 1))
+
+    if last > first:
+        def keep_block():
+            with _lock:
+                _blocks[year] = [first + 1, last]
+
+        db_transaction.on_commit(keep_block)
+
+    return format_invoice(year, first)
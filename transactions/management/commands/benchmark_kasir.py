@@ -0,0 +1,113 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+
+from produks.models import GudangProduct, KantinProduct
+from users.models import User
+
+
+ENDPOINTS = {
+    'catalog': ('get', '/api/kantin/produk/', '/api/async/kantin/produk/'),
+    'history': ('get', '/api/history/', '/api/async/history/'),
+    'payment': ('post', '/api/payment/', '/api/async/payment/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent kasir throughput of the WSGI (DRF) endpoints with '
+        'their native async counterparts, on a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--products', type=int, default=50)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        workdir = tempfile.mkdtemp()
+        if connection.vendor == 'sqlite':
+            # A shared-cache in-memory database fails with "table is locked"
+            # under concurrent writers instead of waiting, so use a file.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            tokens, products = self._seed(options['products'], options['concurrency'])
+            for name, (method, wsgi_path, asgi_path) in ENDPOINTS.items():
+                wsgi = self._run_wsgi(method, wsgi_path, tokens, products, options)
+                asgi = asyncio.run(self._run_asgi(method, asgi_path, tokens, products, options))
+                self.stdout.write(
+                    f'{name:<8} wsgi {wsgi:8.1f} req/s   asgi {asgi:8.1f} req/s   '
+                    f'({asgi / wsgi:.2f}x)'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _seed(self, product_count, kasir_count):
+        products = []
+        for i in range(product_count):
+            gudang = GudangProduct.objects.create(
+                name=f'Produk {i}',
+                category='bench',
+                price=1000 + i,
+                stock_gudang=0
+            )
+            products.append(KantinProduct.objects.create(product_gudang=gudang, stock_kantin=10 ** 6).id)
+
+        tokens = []
+        for i in range(kasir_count):
+            user = User.objects.create_user(f'bench_kasir_{i}', f'Kasir {i}', 'bench-password', role='kasir')
+            tokens.append(Token.objects.create(user=user).key)
+        return tokens, products
+
+    def _request_args(self, method, index, tokens, products):
+        headers = {'Authorization': f'Token {tokens[index % len(tokens)]}'}
+        if method == 'get':
+            return {'headers': headers}
+        return {
+            'data': {
+                'items': [
+                    {'product_id': products[(index + offset) % len(products)], 'qty': 1}
+                    for offset in range(3)
+                ],
+                'uang_bayar': 10 ** 6
+            },
+            'content_type': 'application/json',
+            'headers': headers
+        }
+
+    def _run_wsgi(self, method, path, tokens, products, options):
+        def call(index):
+            response = getattr(Client(), method)(path, **self._request_args(method, index, tokens, products))
+            assert response.status_code < 400, response.content
+            connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(call, range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - started)
+
+    async def _run_asgi(self, method, path, tokens, products, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        client = AsyncClient()
+
+        async def call(index):
+            async with semaphore:
+                response = await getattr(client, method)(path, **self._request_args(method, index, tokens, products))
+                assert response.status_code < 400, response.content
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - started)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transactions.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete payment Idempotency-Key records older than IDEMPOTENCY_KEY_TTL.'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} idempotency key(s) purged'))
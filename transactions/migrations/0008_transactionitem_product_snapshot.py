@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_snapshots(apps, schema_editor):
+    TransactionItem = apps.get_model('transactions', 'TransactionItem')
+    GudangProduct = apps.get_model('produks', 'GudangProduct')
+
+    gudang = GudangProduct.objects.filter(kantin_products=OuterRef('product_id'))
+    TransactionItem.objects.filter(product__isnull=False).update(
+        product_name=Subquery(gudang.values('name')[:1]),
+        product_category=Subquery(gudang.values('category')[:1]),
+        product_satuan=Subquery(gudang.values('satuan')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produks', '0005_delete_product_kantinproduct_product_gudang'),
+        ('transactions', '0007_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionitem',
+            name='product_name',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='transactionitem',
+            name='product_category',
+            field=models.CharField(blank=True, default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='transactionitem',
+            name='product_satuan',
+            field=models.CharField(blank=True, default='', max_length=50),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='transactionitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='produks.kantinproduct'),
+        ),
+    ]
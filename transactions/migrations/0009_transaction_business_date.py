@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, TruncDate
+
+
+def backfill_business_time(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Transaction.objects.update(
+        business_date=TruncDate('created_at'),
+        business_hour=ExtractHour('created_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_transactionitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='business_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='business_hour',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_business_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='transaction',
+            name='business_date',
+            field=models.DateField(db_index=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='business_hour',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+    ]
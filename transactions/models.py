@@ -1,7 +1,17 @@
 from django.db import models
 from django.conf import settings
-from produks.models import KantinProduct
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from produks.models import KantinProduct
+from .invoices import next_invoice
+
+
+class InvoiceSequence(models.Model):
+    year = models.PositiveIntegerField(unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.last_number}"
 
 
 class Transaction(models.Model):
@@ -47,22 +57,43 @@ class Transaction(models.Model):
         default='cash'
     )
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    business_date = models.DateField(
+        db_index=True,
+        editable=False
+    )
+
+    business_hour = models.PositiveSmallIntegerField(editable=False)
+
+    # Reference the POS terminal gave an offline sale, so a resent batch is not recorded twice.
+    client_ref = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='trx_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='trx_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_ref'], name='trx_user_client_ref_uniq'),
+        ]
+
+    def stamp_business_time(self):
+        """Store the local (TIME_ZONE) day and hour of ``created_at`` for report filters."""
+        local = timezone.localtime(self.created_at)
+        self.business_date = local.date()
+        self.business_hour = local.hour
 
     def save(self, *args, **kwargs):
         if not self.invoice:
-            year = timezone.now().year
-            last = Transaction.objects.filter(
-                created_at__year=year
-            ).order_by('-id').first()
+            self.invoice = next_invoice()
 
-            last_number = (
-                int(last.invoice.split('-')[-1])
-                if last and last.invoice
-                else 0
-            )
-
-            self.invoice = f"INV-{year}-{last_number + 1:03d}"
+        if self.business_date is None:
+            self.stamp_business_time()
 
         super().save(*args, **kwargs)
 
@@ -78,9 +109,17 @@ class TransactionItem(models.Model):
 
     product = models.ForeignKey(
         KantinProduct,
-        on_delete=models.CASCADE
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
     )
 
+    product_name = models.CharField(max_length=255)
+
+    product_category = models.CharField(max_length=100, blank=True)
+
+    product_satuan = models.CharField(max_length=50, blank=True)
+
     qty = models.PositiveIntegerField()
 
     price = models.DecimalField(
@@ -93,5 +132,43 @@ class TransactionItem(models.Model):
         decimal_places=2
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'transaction'], name='trxitem_product_trx_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} x {self.qty}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+
+    key = models.CharField(max_length=255)
+
+    request_hash = models.CharField(max_length=64)
+
+    status_code = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True
+    )
+
+    response = models.JSONField(
+        encoder=DjangoJSONEncoder,
+        null=True,
+        blank=True
+    )
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True
+    )
+
+    class Meta:
+        unique_together = ('user', 'key')
+
     def __str__(self):
-        return f"{self.product.name} x {self.qty}"
+        return self.key
@@ -0,0 +1,55 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into ``(created_at, pk)``; raises ValueError when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def seek(queryset, cursor, descending=True, prefix=''):
+    """
+    Keyset filter on ``(created_at, id)``: only rows strictly after ``cursor``
+    in the requested direction, so each page is an index range scan instead
+    of an OFFSET over everything before it. ``prefix`` points the keyset at a
+    related transaction, e.g. ``'transaction__'`` for items.
+    """
+    created_field = f'{prefix}created_at'
+    id_field = f'{prefix}id'
+
+    queryset = queryset.order_by(
+        *((f'-{created_field}', f'-{id_field}') if descending else (created_field, id_field))
+    )
+    if not cursor:
+        return queryset
+
+    created_at, pk = decode_cursor(cursor)
+    lookup = 'lt' if descending else 'gt'
+    return queryset.filter(
+        Q(**{f'{created_field}__{lookup}': created_at})
+        | Q(**{created_field: created_at, f'{id_field}__{lookup}': pk})
+    )
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
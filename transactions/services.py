@@ -0,0 +1,381 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+
+from ai_insight.anomalies import observe_sales
+from produks.models import KantinProduct
+from reports.rollups import record_sales
+from .invoices import reserve_invoices
+from .models import Transaction, TransactionItem
+
+
+SYNC_BATCH_LIMIT = 500
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def normalize_items(items):
+    """Validate raw cart lines and merge duplicate products into {product_id: qty}."""
+    quantities = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise CheckoutError('Invalid item data.')
+
+        product_id = item.get('product_id')
+        qty = item.get('qty')
+
+        if not product_id or not qty:
+            raise CheckoutError('Invalid item data.')
+
+        try:
+            product_id = int(product_id)
+            qty = int(qty)
+        except (TypeError, ValueError):
+            raise CheckoutError('Invalid item data.')
+
+        if qty < 1:
+            raise CheckoutError('Invalid item data.')
+
+        quantities[product_id] = quantities.get(product_id, 0) + qty
+    return quantities
+
+
+def parse_amount(value):
+    """Payment amount as a finite, positive Decimal, from a number or numeric string."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str, Decimal)):
+        raise CheckoutError('Invalid payment amount.')
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise CheckoutError('Invalid payment amount.')
+    if not amount.is_finite() or amount <= 0:
+        raise CheckoutError('Invalid payment amount.')
+    return amount
+
+
+def load_products(product_ids):
+    """Fetch every cart product together with its gudang row in a single query."""
+    products = (
+        KantinProduct.objects
+        .select_related('product_gudang')
+        .in_bulk(product_ids)
+    )
+    for product_id in product_ids:
+        if product_id not in products:
+            raise CheckoutError(
+                f'Product with id {product_id} not found.',
+                status.HTTP_404_NOT_FOUND
+            )
+    return products
+
+
+def decrement_stock(quantities, products):
+    """
+    Take ``quantities`` off ``stock_kantin`` with one conditional CASE update.
+
+    The WHERE clause only matches rows that still hold enough stock, so if
+    fewer rows than products were updated somebody else sold the stock first
+    and the caller's atomic block must roll back.
+    """
+    if not quantities:
+        return
+
+    enough_stock = Q()
+    for product_id, qty in quantities.items():
+        enough_stock |= Q(id=product_id, stock_kantin__gte=qty)
+
+    updated = KantinProduct.objects.filter(enough_stock).update(
+        stock_kantin=Case(
+            *[
+                When(id=product_id, then=F('stock_kantin') - qty)
+                for product_id, qty in quantities.items()
+            ],
+            default=F('stock_kantin'),
+            output_field=PositiveIntegerField()
+        ),
+        updated_at=timezone.now()
+    )
+
+    if updated != len(quantities):
+        current = dict(
+            KantinProduct.objects
+            .filter(id__in=quantities.keys())
+            .values_list('id', 'stock_kantin')
+        )
+        for product_id, qty in quantities.items():
+            if current.get(product_id, 0) < qty:
+                raise CheckoutError(
+                    f'Insufficient stock for {products[product_id].name}.'
+                )
+        raise CheckoutError('Stock changed during checkout, please retry.')
+
+
+def price_cart(quantities, products, available):
+    """Check ``quantities`` against ``available`` stock and price every line."""
+    lines = []
+    subtotal = 0
+    for product_id, qty in quantities.items():
+        product = products[product_id]
+        if available.get(product_id, 0) < qty:
+            raise CheckoutError(f'Insufficient stock for {product.name}.')
+
+        total = product.price * qty
+        subtotal += total
+        lines.append((product, qty, total))
+    return lines, subtotal
+
+
+def build_items(transaction, lines):
+    return [
+        TransactionItem(
+            transaction=transaction,
+            product=product,
+            product_name=product.product_gudang.name,
+            product_category=product.product_gudang.category,
+            product_satuan=product.product_gudang.satuan,
+            qty=qty,
+            price=product.price,
+            subtotal=total
+        )
+        for product, qty, total in lines
+    ]
+
+
+def checkout(user, items, uang_bayar, payment_method='cash'):
+    """
+    Record a sale for ``user`` in a constant number of queries.
+
+    Products are loaded once, items are bulk inserted and stock is decremented
+    with a single conditional update inside the same atomic block, so two
+    kasirs can never oversell the same product.
+    """
+    uang_bayar = parse_amount(uang_bayar)
+    quantities = normalize_items(items)
+    products = load_products(list(quantities))
+
+    lines, subtotal = price_cart(
+        quantities,
+        products,
+        {product_id: product.stock_kantin for product_id, product in products.items()}
+    )
+
+    if uang_bayar < subtotal:
+        raise CheckoutError('Payment amount is less than the subtotal.')
+
+    kembalian = uang_bayar - subtotal
+
+    with db_transaction.atomic():
+        decrement_stock(quantities, products)
+
+        transaction = Transaction.objects.create(
+            user=user,
+            total=subtotal,
+            cash_given=uang_bayar,
+            change=kembalian,
+            payment_method=payment_method
+        )
+
+        items = TransactionItem.objects.bulk_create(build_items(transaction, lines))
+        record_sales([transaction], items)
+        observe_sales([transaction], items)
+
+    return {
+        'transaction': transaction,
+        'subtotal': subtotal,
+        'uang_bayar': uang_bayar,
+        'kembalian': kembalian
+    }
+
+
+def _parse_sale(sale):
+    if not isinstance(sale, dict):
+        raise CheckoutError('Invalid sale data.')
+
+    items = sale.get('items')
+    if not items or not sale.get('uang_bayar'):
+        raise CheckoutError('Items and payment amount are required.')
+
+    uang_bayar = parse_amount(sale['uang_bayar'])
+
+    client_ref = sale.get('client_ref')
+    if client_ref is not None:
+        if not isinstance(client_ref, (str, int)) or isinstance(client_ref, bool) or not 0 < len(str(client_ref)) <= 64:
+            raise CheckoutError('Invalid client_ref.')
+        client_ref = str(client_ref)
+
+    created_at = sale.get('created_at')
+    if created_at:
+        try:
+            created_at = parse_datetime(str(created_at))
+        except ValueError:
+            created_at = None
+        if created_at is None:
+            raise CheckoutError('Invalid created_at timestamp.')
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        if created_at > timezone.now():
+            raise CheckoutError('created_at cannot be in the future.')
+    else:
+        created_at = timezone.now()
+
+    payment_method = sale.get('payment_method') or 'cash'
+    if payment_method not in dict(Transaction.PAYMENT_METHODS):
+        raise CheckoutError('Invalid payment method.')
+
+    return {
+        'quantities': normalize_items(items),
+        'uang_bayar': uang_bayar,
+        'created_at': created_at,
+        'payment_method': payment_method,
+        'client_ref': client_ref
+    }
+
+
+def sync_sales(user, sales):
+    """
+    Record a batch of sales queued offline by a POS terminal.
+
+    Stock for the whole batch is read in one query and consumed in the order
+    the sales happened, accepted sales are written with two bulk inserts and
+    stock is decremented with one conditional update, all in one atomic block.
+    Every sale gets its own result so the terminal only resends the failures.
+    A sale whose ``client_ref`` was already recorded for ``user`` is not
+    written again; its original result is returned with ``replayed``.
+    """
+    try:
+        return _sync_sales(user, sales)
+    except IntegrityError:
+        # A concurrent resend of the same batch committed first; replay against it.
+        return _sync_sales(user, sales)
+
+
+def _sync_sales(user, sales):
+    results = [{'client_ref': sale.get('client_ref') if isinstance(sale, dict) else None} for sale in sales]
+    parsed = {}
+
+    for index, sale in enumerate(sales):
+        try:
+            parsed[index] = _parse_sale(sale)
+        except CheckoutError as e:
+            results[index].update({'status': False, 'error': e.message})
+
+    refs = {}
+    for index in sorted(parsed):
+        ref = parsed[index]['client_ref']
+        if ref is None:
+            continue
+        if ref in refs:
+            del parsed[index]
+            results[index].update({'status': False, 'error': 'Duplicate client_ref in batch.'})
+        else:
+            refs[ref] = index
+
+    if refs:
+        for transaction in Transaction.objects.filter(user=user, client_ref__in=refs):
+            index = refs[transaction.client_ref]
+            del parsed[index]
+            results[index].update({
+                'status': True,
+                'replayed': True,
+                'invoice': transaction.invoice,
+                'subtotal': transaction.total,
+                'uang_bayar': transaction.cash_given,
+                'kembalian': transaction.change
+            })
+
+    product_ids = {product_id for sale in parsed.values() for product_id in sale['quantities']}
+
+    with db_transaction.atomic():
+        products = (
+            KantinProduct.objects
+            .select_for_update()
+            .select_related('product_gudang')
+            .in_bulk(product_ids)
+        )
+        available = {product_id: product.stock_kantin for product_id, product in products.items()}
+
+        accepted = []
+        consumed = {}
+        for index in sorted(parsed, key=lambda i: parsed[i]['created_at']):
+            sale = parsed[index]
+            try:
+                for product_id in sale['quantities']:
+                    if product_id not in products:
+                        raise CheckoutError(f'Product with id {product_id} not found.')
+
+                lines, subtotal = price_cart(sale['quantities'], products, available)
+
+                if sale['uang_bayar'] < subtotal:
+                    raise CheckoutError('Payment amount is less than the subtotal.')
+            except CheckoutError as e:
+                results[index].update({'status': False, 'error': e.message})
+                continue
+
+            for product_id, qty in sale['quantities'].items():
+                available[product_id] -= qty
+                consumed[product_id] = consumed.get(product_id, 0) + qty
+
+            accepted.append((index, sale, lines, subtotal))
+
+        if not accepted:
+            return results
+
+        decrement_stock(consumed, products)
+
+        by_year = {}
+        for entry in accepted:
+            year = timezone.localtime(entry[1]['created_at']).year
+            by_year.setdefault(year, []).append(entry)
+
+        invoices = {}
+        for year, entries in by_year.items():
+            for entry, invoice in zip(entries, reserve_invoices(len(entries), year)):
+                invoices[entry[0]] = invoice
+
+        transactions = []
+        for index, sale, lines, subtotal in accepted:
+            transaction = Transaction(
+                user=user,
+                invoice=invoices[index],
+                total=subtotal,
+                cash_given=sale['uang_bayar'],
+                change=sale['uang_bayar'] - subtotal,
+                payment_method=sale['payment_method'],
+                created_at=sale['created_at'],
+                client_ref=sale['client_ref']
+            )
+            transaction.stamp_business_time()
+            transactions.append(transaction)
+
+        transactions = Transaction.objects.bulk_create(transactions)
+
+        items = TransactionItem.objects.bulk_create(
+            [
+                item
+                for transaction, (index, sale, lines, subtotal) in zip(transactions, accepted)
+                for item in build_items(transaction, lines)
+            ],
+            batch_size=500
+        )
+        record_sales(transactions, items)
+        observe_sales(transactions, items)
+
+    for index, sale, lines, subtotal in accepted:
+        results[index].update({
+            'status': True,
+            'invoice': invoices[index],
+            'subtotal': subtotal,
+            'uang_bayar': sale['uang_bayar'],
+            'kembalian': sale['uang_bayar'] - subtotal
+        })
+
+    return results
@@ -1,3 +1,476 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from produks.models import KantinProduct
+from rest_framework.authtoken.models import Token
+from reports.tests import ApiTestCase, QueryPlanTestCase
+from .idempotency import fingerprint
+from .invoices import reserve_invoices
+from .models import IdempotencyKey, InvoiceSequence, Transaction, TransactionItem
+from .services import CheckoutError, decrement_stock, load_products, sync_sales
+
+
+class CheckoutTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.nasi = self.make_product('Nasi Goreng', price=12000, stock_kantin=5)
+        self.teh = self.make_product('Es Teh', price=3000, stock_kantin=10)
+
+    def test_payment_records_sale_and_decrements_stock(self):
+        response = self.pay(self.kasir, [(self.nasi, 2), (self.teh, 1), (self.teh, 2)], 50000)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['subtotal'], 33000)
+        self.assertEqual(response.data['kembalian'], 17000)
+
+        trx = Transaction.objects.get(invoice=response.data['invoice'])
+        self.assertEqual(
+            sorted(trx.items.values_list('product_name', 'qty')),
+            [('Es Teh', 3), ('Nasi Goreng', 2)]
+        )
+        self.nasi.refresh_from_db()
+        self.teh.refresh_from_db()
+        self.assertEqual((self.nasi.stock_kantin, self.teh.stock_kantin), (3, 7))
+
+    def test_oversell_is_rejected_without_side_effects(self):
+        response = self.pay(self.kasir, [(self.teh, 1), (self.nasi, 6)], 100000)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Nasi Goreng', response.data['error'])
+        self.assertFalse(Transaction.objects.exists())
+        self.teh.refresh_from_db()
+        self.assertEqual(self.teh.stock_kantin, 10)
+
+    def test_payment_errors(self):
+        self.assertEqual(self.pay(self.kasir, [(self.nasi, 1)], 1000).status_code, 400)
+        response = self.request(self.kasir, 'post', '/api/payment/', {
+            'items': [{'product_id': 999999, 'qty': 1}],
+            'uang_bayar': 1000
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.pay(self.admin, [(self.nasi, 1)], 20000).status_code, 403)
+
+    def test_payment_amount_is_parsed(self):
+        response = self.pay(self.kasir, [(self.nasi, 1)], 15000.5)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['kembalian'], Decimal('3000.5'))
+
+        response = self.pay(self.kasir, [(self.nasi, 1)], '20000')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['kembalian'], 8000)
+
+        for uang_bayar in ('NaN', 'Infinity', 'abc', -5000, [20000], True):
+            response = self.pay(self.kasir, [(self.nasi, 1)], uang_bayar)
+            self.assertEqual(response.status_code, 400, uang_bayar)
+            self.assertEqual(response.data['error'], 'Invalid payment amount.')
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_decrement_stock_fails_when_stock_moved(self):
+        products = load_products([self.nasi.id, self.teh.id])
+        KantinProduct.objects.filter(id=self.nasi.id).update(stock_kantin=1)
+
+        with self.assertRaises(CheckoutError):
+            with db_transaction.atomic():
+                decrement_stock({self.teh.id: 4, self.nasi.id: 2}, products)
+
+        self.teh.refresh_from_db()
+        self.assertEqual(self.teh.stock_kantin, 10)
+
+        with db_transaction.atomic():
+            decrement_stock({self.teh.id: 4, self.nasi.id: 1}, products)
+        self.nasi.refresh_from_db()
+        self.teh.refresh_from_db()
+        self.assertEqual((self.nasi.stock_kantin, self.teh.stock_kantin), (0, 6))
+
+
+class InvoiceSequenceTests(ApiTestCase):
+    def test_invoices_are_consecutive_per_year(self):
+        year = timezone.localdate().year
+        product = self.make_product('Roti', stock_kantin=10)
+
+        invoices = [self.pay(self.kasir, [(product, 1)], 5000).data['invoice'] for _ in range(3)]
+
+        self.assertEqual(invoices, [f'INV-{year}-001', f'INV-{year}-002', f'INV-{year}-003'])
+        self.assertEqual(InvoiceSequence.objects.get(year=year).last_number, 3)
+
+    def test_sequence_continues_after_existing_invoices(self):
+        year = timezone.localdate().year
+        for number in (9, 120, 41):
+            Transaction.objects.create(user=self.kasir, total=1000, invoice=f'INV-{year}-{number:03d}')
+
+        self.assertEqual(reserve_invoices(2, year), [f'INV-{year}-121', f'INV-{year}-122'])
+        self.assertEqual(reserve_invoices(1, year), [f'INV-{year}-123'])
+        self.assertEqual(reserve_invoices(1, year - 1), [f'INV-{year - 1}-001'])
+
+
+class SyncSalesTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.roti = self.make_product('Roti', price=5000, stock_kantin=3)
+
+    def sync(self, sales):
+        return self.request(self.kasir, 'post', '/api/payment/sync/', {'sales': sales})
+
+    def sale(self, ref, qty, uang_bayar=50000, hours_ago=1):
+        return {
+            'client_ref': ref,
+            'created_at': (timezone.now() - timedelta(hours=hours_ago)).isoformat(),
+            'uang_bayar': uang_bayar,
+            'items': [{'product_id': self.roti.id, 'qty': qty}],
+        }
+
+    def test_partial_failure_reports_each_sale(self):
+        response = self.sync([
+            self.sale('a', 2, hours_ago=1),
+            self.sale('b', 2, hours_ago=2),
+            self.sale('c', 1, uang_bayar='NaN'),
+            self.sale('d', 1, uang_bayar='Infinity'),
+            self.sale('e', 1, uang_bayar=-5000),
+        ])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        results = {r['client_ref']: r for r in response.data['results']}
+        # Stock goes to the sale that happened first, not the first in the list.
+        self.assertTrue(results['b']['status'])
+        self.assertFalse(results['a']['status'])
+        for ref in 'cde':
+            self.assertEqual(results[ref], {'client_ref': ref, 'status': False, 'error': 'Invalid payment amount.'})
+        self.assertEqual((response.data['diterima'], response.data['ditolak']), (1, 4))
+
+        self.roti.refresh_from_db()
+        self.assertEqual(self.roti.stock_kantin, 1)
+
+    def test_resent_batch_is_not_recorded_twice(self):
+        batch = [self.sale('a', 1), self.sale('b', 1, hours_ago=2)]
+        first = self.sync(batch).data['results']
+        again = self.sync(batch).data['results']
+
+        self.assertEqual([r['invoice'] for r in again], [r['invoice'] for r in first])
+        self.assertTrue(all(r['status'] and r['replayed'] for r in again))
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.roti.refresh_from_db()
+        self.assertEqual(self.roti.stock_kantin, 1)
+
+        other = self.request(self.kasir2, 'post', '/api/payment/sync/', {'sales': [self.sale('a', 1)]})
+        self.assertNotIn('replayed', other.data['results'][0])
+
+    def test_duplicate_client_ref_in_batch(self):
+        results = self.sync([self.sale('a', 1), self.sale('a', 1)]).data['results']
+        self.assertEqual([r['status'] for r in results], [True, False])
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class IdempotencyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.roti = self.make_product('Roti', price=5000, stock_kantin=10)
+
+    def test_retry_replays_stored_response(self):
+        first = self.pay(self.kasir, [(self.roti, 2)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+        retry = self.pay(self.kasir, [(self.roti, 2)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.roti.refresh_from_db()
+        self.assertEqual(self.roti.stock_kantin, 8)
+
+    def test_key_reused_with_different_body(self):
+        self.pay(self.kasir, [(self.roti, 2)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+        response = self.pay(self.kasir, [(self.roti, 3)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_keys_are_per_user_and_errors_are_replayed(self):
+        self.pay(self.kasir, [(self.roti, 1)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+        other = self.pay(self.kasir2, [(self.roti, 1)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(other.status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+        rejected = self.pay(self.kasir, [(self.roti, 50)], 500000, HTTP_IDEMPOTENCY_KEY='k-2')
+        self.roti.stock_kantin = 100
+        self.roti.save()
+        retry = self.pay(self.kasir, [(self.roti, 50)], 500000, HTTP_IDEMPOTENCY_KEY='k-2')
+        self.assertEqual((rejected.status_code, retry.status_code), (400, 400))
+        self.assertEqual(IdempotencyKey.objects.filter(user=self.kasir).count(), 2)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_abandoned_pending_key_is_reclaimed(self):
+        body = {'items': [{'product_id': self.roti.id, 'qty': 1}], 'uang_bayar': 20000}
+        pending = IdempotencyKey.objects.create(user=self.kasir, key='k-1', request_hash=fingerprint(body))
+
+        busy = self.pay(self.kasir, [(self.roti, 1)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(busy.status_code, 409)
+
+        IdempotencyKey.objects.filter(pk=pending.pk).update(
+            created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_PROCESSING_TIMEOUT + 1)
+        )
+        retry = self.pay(self.kasir, [(self.roti, 1)], 20000, HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get(user=self.kasir, key='k-1').status_code, 201)
+
+
+class HistoryPagingTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        roti = cls.make_product('Roti', stock_kantin=100)
+        now = timezone.now()
+        for user in (cls.kasir, cls.kasir2):
+            # Pairs of sales share a timestamp, so paging has to break ties on id.
+            sync_sales(user, [
+                {
+                    'created_at': (now - timedelta(minutes=i // 2)).isoformat(),
+                    'uang_bayar': 10000,
+                    'items': [{'product_id': roti.id, 'qty': 1}],
+                }
+                for i in range(7)
+            ])
+
+    def walk(self, user, **params):
+        invoices, params = [], {**params, 'page_size': 3}
+        while True:
+            data = self.request(user, 'get', '/api/history/', params).data
+            self.assertLessEqual(len(data['results']), 3)
+            invoices += [row['invoice'] for row in data['results']]
+            if not data['next_cursor']:
+                return invoices
+            params['cursor'] = data['next_cursor']
+
+    def test_cursor_pages_cover_every_transaction_once(self):
+        expected = list(
+            Transaction.objects.order_by('-created_at', '-id').values_list('invoice', flat=True)
+        )
+        self.assertEqual(self.walk(self.admin), expected)
+
+    def test_kasir_sees_only_own_sales(self):
+        expected = list(
+            Transaction.objects.filter(user=self.kasir).order_by('-created_at', '-id').values_list('invoice', flat=True)
+        )
+        self.assertEqual(self.walk(self.kasir), expected)
+        self.assertEqual(self.walk(self.admin, kasir=self.kasir2.id), list(
+            Transaction.objects.filter(user=self.kasir2).order_by('-created_at', '-id').values_list('invoice', flat=True)
+        ))
+
+    def test_items_and_bad_cursor(self):
+        row = self.request(self.admin, 'get', '/api/history/').data['results'][0]
+        self.assertEqual(row['items'], [{'name': 'Roti', 'qty': 1, 'subtotal': 1000}])
+        self.assertEqual(self.request(self.admin, 'get', '/api/history/', {'cursor': 'bukan-cursor'}).status_code, 400)
+
+
+class LedgerExportTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        roti = cls.make_product('Roti', price=5000, stock_kantin=100)
+        teh = cls.make_product('Es Teh', price=3000, stock_kantin=100)
+        now = timezone.now()
+        sync_sales(cls.kasir, [
+            {
+                'created_at': (now - timedelta(days=i)).isoformat(),
+                'uang_bayar': 50000,
+                'items': [{'product_id': roti.id, 'qty': i + 1}, {'product_id': teh.id, 'qty': 1}],
+            }
+            for i in range(3)
+        ])
+        cls.invoices = list(Transaction.objects.order_by('created_at', 'id').values_list('invoice', flat=True))
+
+    def export(self, **params):
+        response = self.request(self.admin, 'get', '/api/history/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_ndjson_has_one_line_per_transaction(self):
+        lines = [json.loads(line) for line in self.export().streamed_content.decode().splitlines()]
+
+        self.assertEqual([line['invoice'] for line in lines], self.invoices)
+        self.assertEqual(
+            [(item['produk'], item['qty']) for item in lines[0]['items']],
+            [('Roti', 3), ('Es Teh', 1)]
+        )
+        self.assertEqual(lines[0]['total'], '18000.00')
+
+        resumed = self.export(cursor=lines[0]['cursor']).streamed_content.decode().splitlines()
+        self.assertEqual([json.loads(line)['invoice'] for line in resumed], self.invoices[1:])
+
+    def test_csv_is_gzipped_with_one_row_per_item(self):
+        response = self.export(type='csv')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+
+        rows = list(csv.reader(io.StringIO(gzip.decompress(response.streamed_content).decode())))
+        self.assertEqual(rows[0][:3], ['invoice', 'created_at', 'kasir'])
+        self.assertEqual(len(rows), 1 + 6)
+        self.assertEqual([row[0] for row in rows[1::2]], self.invoices)
+
+    def test_csv_resumes_after_last_complete_transaction(self):
+        rows = list(csv.reader(io.StringIO(gzip.decompress(self.export(type='csv').streamed_content).decode())))[1:]
+        # Only the last item of a transaction carries a cursor.
+        self.assertEqual([bool(row[-1]) for row in rows], [False, True] * 3)
+
+        # A download cut after the first item of the second transaction resumes
+        # from the last cursor received, so that transaction comes again in full.
+        received = rows[:3]
+        cursor = [row[-1] for row in received if row[-1]][-1]
+        resumed = list(csv.reader(io.StringIO(
+            gzip.decompress(self.export(type='csv', cursor=cursor).streamed_content).decode()
+        )))[1:]
+
+        self.assertEqual([row[0] for row in resumed], [row[0] for row in rows[2:]])
+        self.assertEqual([(row[8], row[9]) for row in resumed[:2]], [('Roti', '2'), ('Es Teh', '1')])
+
+    def test_export_requires_admin_and_valid_params(self):
+        self.assertEqual(self.request(self.kasir, 'get', '/api/history/export/').status_code, 403)
+        self.assertEqual(self.request(self.admin, 'get', '/api/history/export/', {'type': 'xml'}).status_code, 400)
+        self.assertEqual(self.request(self.admin, 'get', '/api/history/export/', {'start': 'kemarin'}).status_code, 400)
+
+
+class ItemSnapshotTests(ApiTestCase):
+    def test_items_keep_product_details_from_sale_time(self):
+        product = self.make_product('Kopi Susu', price=8000, category='Minuman')
+        product.product_gudang.satuan = 'gelas'
+        product.product_gudang.save()
+        self.pay(self.kasir, [(product, 2)], 20000)
+
+        product.product_gudang.name = 'Kopi Susu Gula Aren'
+        product.product_gudang.category = 'Kopi'
+        product.product_gudang.save()
+
+        item = TransactionItem.objects.get()
+        self.assertEqual(
+            (item.product_name, item.product_category, item.product_satuan),
+            ('Kopi Susu', 'Minuman', 'gelas')
+        )
+
+        product.product_gudang.delete()
+        item.refresh_from_db()
+        self.assertIsNone(item.product_id)
+
+        row = self.request(self.admin, 'get', '/api/history/').data['results'][0]
+        self.assertEqual(row['items'], [{'name': 'Kopi Susu', 'qty': 2, 'subtotal': 16000}])
+
+
+class AsyncEndpointTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.roti = self.make_product('Roti', price=5000, stock_kantin=10)
+
+    def client_for(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_async_payment(self):
+        client = self.client_for(self.kasir)
+        body = {'items': [{'product_id': self.roti.id, 'qty': 2}], 'uang_bayar': 20000}
+
+        first = client.post('/api/async/payment/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='a-1')
+        retry = client.post('/api/async/payment/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='a-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.roti.refresh_from_db()
+        self.assertEqual(self.roti.stock_kantin, 8)
+
+        body['items'][0]['qty'] = 9
+        oversell = client.post('/api/async/payment/', body, content_type='application/json')
+        self.assertEqual(oversell.status_code, 400)
+
+    def test_async_payment_amount_is_parsed(self):
+        client = self.client_for(self.kasir)
+        body = {'items': [{'product_id': self.roti.id, 'qty': 1}]}
+
+        ok = client.post('/api/async/payment/', {**body, 'uang_bayar': '5000.5'}, content_type='application/json')
+        bad = client.post('/api/async/payment/', {**body, 'uang_bayar': 'NaN'}, content_type='application/json')
+
+        self.assertEqual(ok.status_code, 201)
+        self.assertEqual(bad.status_code, 400)
+
+    def test_async_auth(self):
+        body = {'items': [{'product_id': self.roti.id, 'qty': 1}], 'uang_bayar': 20000}
+        self.assertEqual(Client().post('/api/async/payment/', body, content_type='application/json').status_code, 401)
+        self.assertEqual(
+            self.client_for(self.admin).post('/api/async/payment/', body, content_type='application/json').status_code,
+            403
+        )
+        self.assertEqual(Client(HTTP_AUTHORIZATION='Token salah').get('/api/async/history/').status_code, 401)
+
+    def test_async_history_matches_sync(self):
+        self.pay(self.kasir, [(self.roti, 1)], 5000)
+        self.pay(self.kasir2, [(self.roti, 1)], 5000)
+
+        response = self.client_for(self.kasir).get('/api/async/history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['invoice'] for row in response.json()['results']],
+            [row['invoice'] for row in self.request(self.kasir, 'get', '/api/history/').data['results']]
+        )
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class BusinessDateTests(ApiTestCase):
+    def test_business_date_and_hour_are_local(self):
+        roti = self.make_product('Roti', stock_kantin=10)
+        sync_sales(self.kasir, [{
+            'created_at': '2024-03-04T17:30:00+00:00',
+            'uang_bayar': 1000,
+            'items': [{'product_id': roti.id, 'qty': 1}],
+        }])
+        self.pay(self.kasir, [(roti, 1)], 1000)
+
+        synced, paid = Transaction.objects.order_by('created_at')
+        self.assertEqual((str(synced.business_date), synced.business_hour), ('2024-03-05', 0))
+        now = timezone.localtime()
+        self.assertEqual(paid.business_date, now.date())
+        self.assertIn(paid.business_hour, (now.hour, (now.hour - 1) % 24))
+
+        data = self.request(self.admin, 'get', '/api/laporan/harian/', {'date': '2024-03-05'}).data
+        self.assertEqual([d['invoice'] for d in data['penjualan']['detail']], [synced.invoice])
+
+
+class TransactionQueryPlanTests(QueryPlanTestCase):
+    def test_history(self):
+        self.assertIndexed(self.admin, '/api/history/')
+        self.assertIndexed(self.kasir, '/api/history/')
+
+    def test_history_next_page(self):
+        cursor = self.request(self.admin, 'get', '/api/history/').data['next_cursor']
+        self.assertIndexed(self.admin, '/api/history/', {'cursor': cursor})
+        cursor = self.request(self.kasir, 'get', '/api/history/').data['next_cursor']
+        self.assertIndexed(self.kasir, '/api/history/', {'cursor': cursor})
+
+    def test_history_filters(self):
+        self.assertIndexed(self.admin, '/api/history/', {
+            'kasir': self.kasir.id,
+            'start': (self.today - timedelta(days=7)).isoformat(),
+            'end': self.today.isoformat()
+        })
+        self.assertIndexed(self.admin, '/api/history/', {'product': self.products[0].id})
+        self.assertIndexed(self.admin, '/api/history/', {'invoice': 'INV-'})
+
+    def test_export_history(self):
+        period = {
+            'start': (self.today - timedelta(days=10)).isoformat(),
+            'end': self.today.isoformat()
+        }
+        self.assertIndexed(self.admin, '/api/history/export/', period)
+        self.assertIndexed(self.admin, '/api/history/export/', {**period, 'type': 'csv'})
+
+    def test_payment(self):
+        self.assertIndexed(self.kasir, '/api/payment/', {
+            'items': [{'product_id': self.products[0].id, 'qty': 1}],
+            'uang_bayar': 100000
+        }, method='post')
@@ -1,7 +1,12 @@
 from django.urls import path
-from .views import payment, history
+from .views import payment, sync_payment, history, export_history
+from . import async_views
 
 urlpatterns = [
     path('payment/', payment),
+    path('payment/sync/', sync_payment),
     path('history/', history),
+    path('history/export/', export_history),
+    path('async/payment/', async_views.payment),
+    path('async/history/', async_views.history),
 ]
@@ -2,101 +2,129 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, BasePermission
-from django.db import transaction as db_transaction
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
 from .models import Transaction, TransactionItem
-from produks.models import KantinProduct
+from .idempotency import idempotent
+from .pagination import seek, encode_cursor, decode_cursor, page_size
+from .exports import iter_item_rows, stream_ndjson, stream_csv_gzip
+from .services import checkout, sync_sales, CheckoutError, SYNC_BATCH_LIMIT
 
 
 class IsKasir(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == 'kasir'
 
-@api_view(['POST'])
-@permission_classes([IsKasir])
-def payment(request):
-    items = request.data.get('items')
-    uang_bayar = request.data.get('uang_bayar')
+
+class IsAdmin(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.role == 'admin'
+
+def payment_response(user, data):
+    items = data.get('items')
+    uang_bayar = data.get('uang_bayar')
 
     if not items or not uang_bayar:
         return Response({'error': 'Items and payment amount are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    subtotal = 0
-    validated_items = []
+    try:
+        result = checkout(user, items, uang_bayar)
+    except CheckoutError as e:
+        return Response({'error': e.message}, status=e.status_code)
 
-    # Validate each item and calculate subtotal
-    for item in items:
-        product_id = item.get('product_id')
-        qty = item.get('qty')
-
-        if not product_id or not qty:
-            return Response({'error': 'Invalid item data.'}, status=status.HTTP_400_BAD_REQUEST)
+    response_data = {
+        'status': True,
+        'invoice': result['transaction'].invoice,
+        'subtotal': result['subtotal'],
+        'uang_bayar': result['uang_bayar'],
+        'kembalian': result['kembalian']
+    }
 
-        try:
-            product = KantinProduct.objects.get(id=product_id)
-        except KantinProduct.DoesNotExist:
-            return Response({'error': f'Product with id {product_id} not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(response_data, status=status.HTTP_201_CREATED)
 
-        if product.stock_kantin < qty:
-            return Response({'error': f'Insufficient stock for {product.name}.'}, status=status.HTTP_400_BAD_REQUEST)
+@api_view(['POST'])
+@permission_classes([IsKasir])
+@idempotent
+def payment(request):
+    return payment_response(request.user, request.data)
 
-        total = product.price * qty
-        subtotal += total
+@api_view(['POST'])
+@permission_classes([IsKasir])
+@idempotent
+def sync_payment(request):
+    sales = request.data.get('sales')
 
-        validated_items.append({'product': product, 'qty': qty, 'total': total})
+    if not sales or not isinstance(sales, list):
+        return Response({'error': 'Sales are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if uang_bayar < subtotal:
-        return Response({'error': 'Payment amount is less than the subtotal.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(sales) > SYNC_BATCH_LIMIT:
+        return Response({'error': f'At most {SYNC_BATCH_LIMIT} sales per request.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    kembalian = uang_bayar - subtotal
+    try:
+        results = sync_sales(request.user, sales)
+    except CheckoutError as e:
+        return Response({'error': e.message}, status=status.HTTP_409_CONFLICT)
 
-    with db_transaction.atomic():
-        transaction = Transaction.objects.create(
-            user=request.user,
-            total=subtotal,
-            cash_given=uang_bayar,
-            change=kembalian,
-            payment_method='cash'
+    return Response({
+        'status': True,
+        'diterima': sum(1 for r in results if r['status']),
+        'ditolak': sum(1 for r in results if not r['status']),
+        'results': results
+    }, status=status.HTTP_200_OK)
+
+def _local_midnight(value):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Invalid date: {value}')
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def history_queryset(user, params):
+    """Filtered, keyset-ordered history for ``user``; raises ValueError on bad params."""
+    if user.role == 'admin':
+        transactions = Transaction.objects.all()
+    else:
+        transactions = Transaction.objects.filter(user=user)
+
+    if params.get('kasir') and user.role == 'admin':
+        transactions = transactions.filter(user_id=int(params.get('kasir')))
+    if params.get('start'):
+        transactions = transactions.filter(created_at__gte=_local_midnight(params.get('start')))
+    if params.get('end'):
+        transactions = transactions.filter(
+            created_at__lt=_local_midnight(params.get('end')) + timedelta(days=1)
+        )
+    if params.get('invoice'):
+        transactions = transactions.filter(invoice__startswith=params.get('invoice'))
+    if params.get('product'):
+        transactions = transactions.filter(
+            Exists(TransactionItem.objects.filter(
+                transaction=OuterRef('pk'),
+                product_id=int(params.get('product'))
+            ))
         )
 
-        for item in validated_items:
-            product = item['product']
-            qty = item['qty']
-            total = item['total']
-
-            TransactionItem.objects.create(
-                transaction=transaction,
-                product=product,
-                qty=qty,
-                price=product.price,
-                subtotal=total
-            )
-
-            product.stock_kantin -= qty
-            product.save()
-
-    response_data = {
-        'status': True,
-        'invoice': transaction.invoice,
-        'subtotal': subtotal,
-        'uang_bayar': uang_bayar,
-        'kembalian': kembalian
-    }
+    return (
+        seek(transactions, params.get('cursor'))
+        .select_related('user')
+        .prefetch_related('items')
+    )
 
-    return Response(response_data, status=status.HTTP_201_CREATED)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def history(request):
-    if request.user.role == 'admin':
-        transactions = Transaction.objects.all().order_by('-created_at')
-    else:
-        transactions = Transaction.objects.filter(user=request.user).order_by('-created_at')
+def history_page(page, size):
+    next_cursor = None
+    if len(page) > size:
+        page = page[:size]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
 
     result = []
-    for trx in transactions:
+    for trx in page:
         items = [
             {
-                'name': item.product.name,
+                'name': item.product_name,
                 'qty': item.qty,
                 'subtotal': item.subtotal
             }
@@ -114,4 +142,53 @@ def history(request):
             'items': items
         })
 
-    return Response(result, status=status.HTTP_200_OK)
+    return {
+        'status': True,
+        'next_cursor': next_cursor,
+        'results': result
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def history(request):
+    try:
+        transactions = history_queryset(request.user, request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    size = page_size(request.query_params.get('page_size'))
+    page = list(transactions[:size + 1])
+
+    return Response(history_page(page, size), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def export_history(request):
+    params = request.query_params
+    export_type = params.get('type', 'ndjson')
+
+    if export_type not in ('ndjson', 'csv'):
+        return Response({'error': 'type must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start = _local_midnight(params.get('start')) if params.get('start') else None
+        end = _local_midnight(params.get('end')) + timedelta(days=1) if params.get('end') else None
+        cursor = params.get('cursor')
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = iter_item_rows(start, end, cursor)
+    stamp = timezone.localtime().strftime('%Y%m%d%H%M%S')
+
+    if export_type == 'csv':
+        response = StreamingHttpResponse(stream_csv_gzip(rows), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename=ledger_{stamp}.csv.gz'
+    else:
+        response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename=ledger_{stamp}.ndjson'
+
+    return response
@@ -0,0 +1,18 @@
+from rest_framework.authtoken.models import Token
+
+
+async def aauthenticate(request):
+    """
+    Resolve the ``Authorization: Token <key>`` header for native async views,
+    which run outside DRF. Returns the active user or ``None``.
+    """
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key.strip():
+        return None
+
+    try:
+        token = await Token.objects.select_related('user').aget(key=key.strip())
+    except Token.DoesNotExist:
+        return None
+
+    return token.user if token.user.is_active else None